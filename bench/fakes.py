@@ -0,0 +1,393 @@
+"""
+Local stand-ins for the services the trackers call, served by one FastAPI app
+in its own process (see bench.run):
+
+- /origin/{host}/{path}: any other origin. The bench http client rewrites
+  every outbound url to this route, so r.jina.ai serves the registered page
+  markdown, www.sbir.gov serves a generated topics CSV and anything else
+  answers the fingerprint HEAD probe.
+- /browserbase/{url}: rendered html of a registered page
+- /openai/v1/chat/completions, /openai/v1/embeddings: instructor tool-call
+  responses (plain and streamed) built from the prompt, with configurable
+  latency and injected 429s
+- /supabase/rest/v1/{table}: in-memory PostgREST upsert/update/select
+
+Calls are counted per service, see GET /_stats.
+"""
+
+import asyncio
+import base64
+import csv
+import hashlib
+import io
+import json
+import random
+import re
+import struct
+import time
+from collections import Counter
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+PRIMARY_KEYS = {"news": "url", "sbir": "SBIRTopicLink"}
+CANDIDATE_LINE = re.compile(r"^(.+?) \| (https?://\S+)$", re.M)
+MARKDOWN_LINK = re.compile(r"\[([^\]]{12,})\]\((https?://[^)\s]+)\)")
+TOPIC_LINK = re.compile(r"^Topic Link: (\S+)$", re.M)
+# ~4 characters per token, as src.llm estimates
+CHARS_PER_TOKEN = 4
+
+
+class Fakes:
+    def __init__(self, options: dict):
+        self.options = options
+        self.random = random.Random(options.get("seed", 0))
+        self.calls = Counter()
+        self.pages: dict[str, dict] = {}
+        self.tables: dict[str, dict[str, dict]] = {t: {} for t in PRIMARY_KEYS}
+
+    async def latency(self, service: str) -> None:
+        if seconds := self.options.get(f"{service}_latency", 0):
+            # +-50% around the configured latency
+            await asyncio.sleep(seconds * self.random.uniform(0.5, 1.5))
+
+    def reset(self, options: dict) -> None:
+        self.__init__({**self.options, **options})
+
+    def stats(self) -> dict:
+        return {
+            "calls": dict(sorted(self.calls.items())),
+            "rows": {t: len(rows) for t, rows in self.tables.items()},
+        }
+
+
+def sbir_csv(topics: int, seed: int) -> str:
+    rng = random.Random(seed)
+    agencies = ["DOD", "NASA", "DOE", "NSF", "HHS", "DHS"]
+    words = (
+        "autonomous sensing quantum propulsion thermal hypersonic battery radar "
+        "optical satellite biomedical resilient"
+    ).split()
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(
+        [
+            "Topic Title",
+            "Topic Number",
+            "Agency",
+            "Topic Description",
+            "Open Date",
+            "Close Date",
+            "SBIRTopicLink",
+        ]
+    )
+    for i in range(topics):
+        title = " ".join(rng.sample(words, 4)).title()
+        description = " ".join(rng.choices(words, k=rng.randint(150, 400)))
+        writer.writerow(
+            [
+                title,
+                f"T{i:05d}",
+                rng.choice(agencies),
+                # multi-line quoted fields like the real export
+                f"Objective: {title}.\nDescription: {description}",
+                "2026-10-01",
+                "2026-12-01",
+                f"https://www.sbir.gov/topics/{100000 + i}",
+            ]
+        )
+    return out.getvalue()
+
+
+def tool_arguments(name: str, prompt: str) -> dict:
+    """
+    Arguments for the tool instructor asked for, filled from the prompt.
+    """
+    if name in ("Articles", "IterableArticle"):
+        links = CANDIDATE_LINE.findall(prompt) or MARKDOWN_LINK.findall(prompt)
+        articles = [{"headline": h.strip(), "url": u} for h, u in links]
+        return {"articles" if name == "Articles" else "tasks": articles}
+    if name == "TopicSummaries":
+        return {
+            "summaries": [
+                {"link": link, "summary": f"Summary of {link}: " + "lorem " * 40}
+                for link in TOPIC_LINK.findall(prompt)
+            ]
+        }
+    if name == "Summary":
+        return {"summary": "A concise summary of the topic. " + "lorem " * 40}
+    return {}
+
+
+def embedding(text: str, dimensions: int) -> list[float]:
+    # deterministic per text, so identical headlines get identical vectors
+    rng = random.Random(hashlib.sha1(text.encode()).digest())
+    return [rng.gauss(0, 1) for _ in range(dimensions)]
+
+
+def create_app(options: dict) -> FastAPI:
+    app = FastAPI()
+    fakes = Fakes(options)
+    app.state.fakes = fakes
+
+    @app.get("/_stats")
+    async def stats():
+        return fakes.stats()
+
+    @app.post("/_reset")
+    async def reset(request: Request):
+        fakes.reset(await request.json())
+        return fakes.stats()
+
+    @app.post("/_pages")
+    async def add_pages(request: Request):
+        fakes.pages.update(await request.json())
+        return {"pages": len(fakes.pages)}
+
+    @app.api_route("/origin/{host}/{path:path}", methods=["GET", "HEAD", "POST"])
+    async def origin(host: str, path: str, request: Request):
+        if host == "r.jina.ai":
+            fakes.calls["jina"] += 1
+            await fakes.latency("jina")
+            page = fakes.pages.get(path)
+            if page is None:
+                return PlainTextResponse("not found", status_code=404)
+            return PlainTextResponse(page["markdown"])
+
+        if host == "www.sbir.gov":
+            fakes.calls["sbir"] += 1
+            await fakes.latency("sbir")
+            options = fakes.options
+            body = sbir_csv(options.get("topics", 500), options.get("seed", 0))
+            return PlainTextResponse(body, media_type="text/csv")
+
+        # fingerprint probe against the page's own origin
+        fakes.calls["origin"] += 1
+        url = f"https://{host}/{path}"
+        page = fakes.pages.get(url) or fakes.pages.get(url.rstrip("/"))
+        etag = f'"{hashlib.sha1((page or {}).get("html", "").encode()).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"etag": etag})
+        return Response(status_code=200, headers={"etag": etag})
+
+    @app.get("/browserbase/{url:path}")
+    async def browserbase(url: str):
+        fakes.calls["browserbase"] += 1
+        await fakes.latency("browserbase")
+        page = fakes.pages.get(url)
+        if page is None:
+            return PlainTextResponse("not found", status_code=404)
+        return PlainTextResponse(page["html"], media_type="text/html")
+
+    def throttled(service: str) -> Response | None:
+        if fakes.random.random() < fakes.options.get("openai_429_rate", 0):
+            fakes.calls[f"{service}_429"] += 1
+            return Response(
+                json.dumps(
+                    {
+                        "error": {
+                            "message": "Rate limit reached",
+                            "type": "requests",
+                            "code": "rate_limit_exceeded",
+                        }
+                    }
+                ),
+                status_code=429,
+                media_type="application/json",
+                headers={
+                    "x-ratelimit-remaining-requests": "0",
+                    "x-ratelimit-reset-requests": "1s",
+                },
+            )
+        return None
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        fakes.calls["openai_chat"] += 1
+        await fakes.latency("openai")
+        if response := throttled("openai_chat"):
+            return response
+
+        prompt = "\n".join(m.get("content") or "" for m in body["messages"])
+        name = body["tools"][0]["function"]["name"]
+        arguments = json.dumps(tool_arguments(name, prompt))
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        completion_tokens = len(arguments) // CHARS_PER_TOKEN
+        base = {
+            "id": "chatcmpl-bench",
+            "created": int(time.time()),
+            "model": body["model"],
+        }
+
+        if not body.get("stream"):
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {
+                            "role": "assistant",
+                            "content": None,
+                            "tool_calls": [
+                                {
+                                    "id": "call_0",
+                                    "type": "function",
+                                    "function": {"name": name, "arguments": arguments},
+                                }
+                            ],
+                        },
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+
+        # stream the arguments at openai_tokens_per_second
+        rate = fakes.options.get("openai_tokens_per_second", 0)
+
+        def chunk(delta: dict, finish_reason: str | None = None) -> str:
+            payload = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            yield chunk(
+                {
+                    "role": "assistant",
+                    "tool_calls": [
+                        {
+                            "index": 0,
+                            "id": "call_0",
+                            "type": "function",
+                            "function": {"name": name, "arguments": ""},
+                        }
+                    ],
+                }
+            )
+            size = 64
+            for i in range(0, len(arguments), size):
+                if rate:
+                    await asyncio.sleep(size / CHARS_PER_TOKEN / rate)
+                piece = arguments[i : i + size]
+                yield chunk(
+                    {"tool_calls": [{"index": 0, "function": {"arguments": piece}}]}
+                )
+            yield chunk({}, "tool_calls")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/openai/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        fakes.calls["openai_embeddings"] += 1
+        await fakes.latency("openai")
+        if response := throttled("openai_embeddings"):
+            return response
+
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimensions = body.get("dimensions") or 1536
+        data = []
+        for i, text in enumerate(inputs):
+            vector = embedding(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(
+                    struct.pack(f"<{dimensions}f", *vector)
+                ).decode()
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = sum(len(t) // CHARS_PER_TOKEN for t in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/supabase/rest/v1/{table}")
+    async def upsert(table: str, request: Request):
+        fakes.calls[f"supabase_{table}_upsert"] += 1
+        await fakes.latency("supabase")
+        rows = await request.json()
+        rows = rows if isinstance(rows, list) else [rows]
+        prefer = request.headers.get("prefer", "")
+        key = PRIMARY_KEYS[table]
+        stored = fakes.tables[table]
+
+        inserted = []
+        for row in rows:
+            existing = stored.get(row[key])
+            if existing is None:
+                stored[row[key]] = dict(row)
+                inserted.append(row)
+            elif "resolution=merge-duplicates" in prefer:
+                existing.update(row)
+                inserted.append(existing)
+        if "return=representation" in prefer:
+            return Response(
+                json.dumps(inserted), status_code=201, media_type="application/json"
+            )
+        return Response(status_code=201)
+
+    @app.patch("/supabase/rest/v1/{table}")
+    async def update(table: str, request: Request):
+        fakes.calls[f"supabase_{table}_update"] += 1
+        await fakes.latency("supabase")
+        values = await request.json()
+        key = PRIMARY_KEYS[table]
+        condition = request.query_params.get(key, "")
+        if (row := fakes.tables[table].get(condition.removeprefix("eq."))) is not None:
+            row.update(values)
+        return Response(status_code=204)
+
+    @app.get("/supabase/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        fakes.calls[f"supabase_{table}_select"] += 1
+        await fakes.latency("supabase")
+        params = request.query_params
+        rows = list(fakes.tables[table].values())
+
+        for column, condition in params.items():
+            if column in ("select", "order", "offset", "limit"):
+                continue
+            if condition == "is.null":
+                rows = [r for r in rows if r.get(column) is None]
+            elif condition.startswith("eq."):
+                rows = [r for r in rows if str(r.get(column)) == condition[3:]]
+
+        if order := params.get("order"):
+            column = order.split(".")[0].strip('"')
+            rows.sort(key=lambda r: str(r.get(column) or ""))
+
+        offset, limit = int(params.get("offset", 0)), params.get("limit")
+        if range_header := request.headers.get("range"):
+            start, end = range_header.split("-")
+            offset, limit = int(start), int(end) - int(start) + 1
+        rows = rows[offset : offset + int(limit)] if limit else rows[offset:]
+
+        if (columns := params.get("select", "*")) != "*":
+            names = [c.strip().strip('"') for c in columns.split(",")]
+            rows = [{n: r.get(n) for n in names} for r in rows]
+        return rows
+
+    return app
+
+
+def serve(port: int, options: dict) -> None:
+    """
+    Process entry point, see bench.run.
+    """
+    import uvicorn
+
+    uvicorn.run(create_app(options), host="127.0.0.1", port=port, log_level="warning")
+
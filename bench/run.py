@@ -0,0 +1,398 @@
+"""
+Run the real trackers against the local fakes in bench.fakes and report wall
+time, throughput, calls per service and peak memory.
+
+    python -m bench.run sbir --topics 500
+    python -m bench.run news --runs 2 --openai-429-rate 0.05
+    python -m bench.run news --compare bench/results/news-<commit>.json
+
+Results are written to bench/results/{scenario}-{commit}.json so runs of the
+same scenario and options can be compared across commits.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+import discord
+import httpx
+
+from bench import fakes
+
+RESULTS_DIR = Path(__file__).parent / "results"
+PAGES_DIR = Path(__file__).parent / "pages"
+SCENARIOS = {
+    # name: (tracker, force every source, keep url patterns)
+    "sbir": ("sbir", False, True),
+    "news": ("news", True, True),
+    "news-llm": ("news", True, False),
+    "blogs": ("blogs", True, True),
+}
+STORIES = [
+    "Pentagon awards {n} contract for next-generation satellites",
+    "Startup raises ${n}M to build autonomous drones",
+    "Launch of heavy-lift rocket slips to {n}",
+    "Chipmaker unveils {n}nm process for defense customers",
+    "Navy tests hypersonic interceptor in flight {n}",
+    "Lawmakers weigh {n} percent boost to space budget",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("scenario", choices=SCENARIOS)
+    parser.add_argument("--runs", type=int, default=1, help="runs on the same state")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--topics", type=int, default=500, help="sbir topics")
+    parser.add_argument("--articles", type=int, default=40, help="per source page")
+    parser.add_argument("--jina-latency", type=float, default=0.5)
+    parser.add_argument("--browserbase-latency", type=float, default=3.0)
+    parser.add_argument("--openai-latency", type=float, default=1.0)
+    parser.add_argument("--openai-tokens-per-second", type=float, default=200)
+    parser.add_argument("--openai-429-rate", type=float, default=0.0)
+    parser.add_argument("--supabase-latency", type=float, default=0.05)
+    parser.add_argument("--discord-latency", type=float, default=0.1)
+    parser.add_argument("--compare", type=Path, help="earlier results file")
+    parser.add_argument("--verbose", action="store_true", help="keep tracker logs")
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def commit() -> str:
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"]).returncode
+        return f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def start_fakes(port: int, options: dict) -> multiprocessing.Process:
+    process = multiprocessing.get_context("spawn").Process(
+        target=fakes.serve, args=(port, options), daemon=True
+    )
+    process.start()
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/_stats")
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("fake services did not start")
+
+
+def configure_env(port: int, store: str) -> None:
+    """
+    Point settings at the fakes. Must run before anything imports src.config.
+    """
+    base = f"http://127.0.0.1:{port}"
+    os.environ.update(
+        {
+            "PORT": "0",
+            "RAILWAY_ENVIRONMENT_NAME": "bench",
+            "BROWSERBASE_API_KEY": "bench",
+            "BROWSERBASE_PROJECT_ID": "bench",
+            "SUPABASE_URL": f"{base}/supabase",
+            "SUPABASE_KEY": "bench",
+            "DISCORD_TOKEN": "bench",
+            "OPENAI_API_KEY": "bench",
+            "OPENAI_BASE_URL": f"{base}/openai/v1",
+            "JINA_API_KEY": "bench",
+            "LOCAL_STORE_DIR": store,
+            "SCHEDULER_ENABLED": "false",
+        }
+    )
+
+
+class RewriteTransport(httpx.AsyncBaseTransport):
+    """
+    Sends every request of the shared http client to the fakes' /origin route.
+    """
+
+    def __init__(self, port: int, transport: httpx.AsyncBaseTransport):
+        self.port = port
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        request.url = url.copy_with(
+            scheme="http",
+            host="127.0.0.1",
+            port=self.port,
+            path=f"/origin/{url.host}{url.path}",
+        )
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class DiscordSink:
+    """
+    Stands in for discord channels: records what Delivery sends and rejects
+    messages over Discord's size limits with a 400, like the real API.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.messages = 0
+        self.embeds = 0
+        self.lines = 0
+        self.rejected = 0
+
+    def get_channel(self, channel_id: int) -> "DiscordSink":
+        return self
+
+    async def send(self, content: str | None = None, embeds=None, **kwargs) -> None:
+        await asyncio.sleep(self.latency)
+        embeds = embeds or []
+        if (
+            len(content or "") > 2000
+            or len(embeds) > 10
+            or sum(len(e) for e in embeds) > 6000
+        ):
+            self.rejected += 1
+            raise discord.HTTPException(
+                SimpleNamespace(status=400, reason="Bad Request"),
+                {"code": 50035, "message": "Invalid Form Body"},
+            )
+        self.messages += 1
+        self.embeds += len(embeds or [])
+        self.lines += len(content.splitlines()) if content else 0
+
+
+def synthetic_page(source, articles: int, seed: int) -> dict:
+    """
+    Markdown (as jina returns it) and html (as browserbase does) for a source
+    home page: nav links plus article links. Some stories come from a shared
+    pool, so the same story shows up on several sources like in real life.
+    """
+    rng = random.Random(f"{seed}-{source.url}")
+    origin = source.url.split("/")[0] + "//" + source.url.split("/")[2]
+    links = [(f"{s} page", f"{origin}/{s}/") for s in ("about", "newsletters", "events")]
+    for i in range(articles):
+        if rng.random() < 0.2:
+            headline = rng.choice(STORIES).format(n=rng.randint(1, 3))
+        else:
+            words = rng.sample(STORIES, 2)
+            headline = f"{words[0].split(' ', 3)[-1]} as {words[1].split(' ', 2)[-1]}"
+            headline = headline.format(n=i)
+        slug = "-".join(headline.lower().split()[:6]).replace("$", "")
+        links.append((headline, f"{origin}/2026/10/{rng.randint(1, 28):02d}/{slug}/"))
+    markdown = "\n".join(f"- [{h}]({u})" for h, u in links)
+    html = (
+        "<html><body><nav><a href='/'>Home</a></nav><main>"
+        + "".join(f"<article><a href='{u}'>{h}</a></article>" for h, u in links)
+        + "</main><footer>footer</footer></body></html>"
+    )
+    return {"markdown": f"# {source.title}\n\n{markdown}", "html": html}
+
+
+def recorded_page(source) -> dict | None:
+    """
+    A recorded page in bench/pages/{slug}.md / .html, if there is one.
+    """
+    slug = "".join(c if c.isalnum() else "-" for c in source.url).strip("-")
+    md, html = PAGES_DIR / f"{slug}.md", PAGES_DIR / f"{slug}.html"
+    if not md.exists() and not html.exists():
+        return None
+    return {
+        "markdown": md.read_text() if md.exists() else "",
+        "html": html.read_text() if html.exists() else "",
+    }
+
+
+async def run_scenario(args: argparse.Namespace, port: int) -> dict:
+    from src import llm, metrics, tracking
+    from src.bot import bot, delivery
+    from src.config import settings
+    from src.tracking import news
+    from src.tracking.sources import registry, sources
+
+    base = f"http://127.0.0.1:{port}"
+    tracker, force, patterns = SCENARIOS[args.scenario]
+    importlib.import_module(f"src.tracking.{tracker}")
+    if not args.verbose:
+        # every src logger exists once the tracker is imported
+        for name, logger in logging.root.manager.loggerDict.items():
+            if name.startswith("src") and isinstance(logger, logging.Logger):
+                logger.setLevel(logging.WARNING)
+    control = httpx.AsyncClient(base_url=base, timeout=60)
+
+    # route the shared http client through the fakes
+    settings.clients.get(
+        "http",
+        lambda: httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=10),
+            event_hooks=settings.clients.event_hooks("http"),
+            transport=RewriteTransport(
+                port,
+                httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(
+                        max_connections=settings.HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+                    )
+                ),
+            ),
+        ),
+    )
+
+    # browserbase renders come from the fakes, pruning/markdownify stay real
+    async def bb_get_html(url: str, **kwargs) -> str:
+        response = await control.get(f"/browserbase/{url}")
+        response.raise_for_status()
+        return response.text
+
+    news.bb_get_html = bb_get_html
+
+    sink = DiscordSink(args.discord_latency)
+
+    async def ready() -> None:
+        return None
+
+    bot.wait_until_ready = ready
+    bot.get_channel = sink.get_channel
+
+    tracked = [s for s in sources if s.tracker == tracker]
+    if not patterns:
+        for source in tracked:
+            source.pattern = None
+    pages = {
+        s.url: recorded_page(s) or synthetic_page(s, args.articles, args.seed)
+        for s in tracked
+    }
+    await control.post("/_pages", json=pages)
+
+    runs = []
+    tracemalloc.start()
+    for i in range(args.runs):
+        tracemalloc.reset_peak()
+        before = (await control.get("/_stats")).json()["calls"]
+        sent_before = (sink.messages, sink.lines, sink.embeds, sink.rejected)
+        start = time.perf_counter()
+
+        if tracker == "sbir":
+            await tracking.track_sbir()
+            items = args.topics
+        else:
+            await getattr(tracking, f"track_{tracker}")(force=force)
+            items = len(tracked)
+        await delivery.flush()
+
+        wall = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        after = (await control.get("/_stats")).json()["calls"]
+        calls = {k: v - before.get(k, 0) for k, v in after.items()}
+        calls = {k: v for k, v in calls.items() if v}
+        calls["discord_messages"] = sink.messages - sent_before[0]
+        calls["discord_lines"] = sink.lines - sent_before[1]
+        calls["discord_embeds"] = sink.embeds - sent_before[2]
+        calls["discord_rejected"] = sink.rejected - sent_before[3]
+        runs.append(
+            {
+                "wall_seconds": round(wall, 3),
+                "items": items,
+                "items_per_second": round(items / wall, 3) if wall else 0,
+                "calls": calls,
+                "peak_traced_mb": round(peak / 2**20, 2),
+            }
+        )
+    tracemalloc.stop()
+
+    stats = (await control.get("/_stats")).json()
+    await control.aclose()
+    await settings.clients.close()
+    return {
+        "runs": runs,
+        "rows": stats["rows"],
+        "llm_limiter": llm.limiter.stats(),
+        "llm_cache": llm.cache.stats(),
+        "retries": {",".join(k): v for k, v in metrics.retries.values.items()},
+        # ru_maxrss is KB on linux, bytes on macos
+        "max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            / (2**20 if sys.platform == "darwin" else 2**10),
+            1,
+        ),
+    }
+
+
+def compare(current: dict, previous: dict) -> None:
+    print(f"\n{previous['commit']} -> {current['commit']}")
+    for i, (now, before) in enumerate(zip(current["runs"], previous["runs"])):
+        for key in ("wall_seconds", "items_per_second", "peak_traced_mb"):
+            a, b = before[key], now[key]
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"  run {i + 1} {key}: {a} -> {b} ({change})")
+        for service in sorted(set(now["calls"]) | set(before["calls"])):
+            a, b = before["calls"].get(service, 0), now["calls"].get(service, 0)
+            if a != b:
+                print(f"  run {i + 1} calls {service}: {a} -> {b}")
+
+
+def main() -> None:
+    args = parse_args()
+    options = {
+        "seed": args.seed,
+        "topics": args.topics,
+        "jina_latency": args.jina_latency,
+        "browserbase_latency": args.browserbase_latency,
+        "openai_latency": args.openai_latency,
+        "openai_tokens_per_second": args.openai_tokens_per_second,
+        "openai_429_rate": args.openai_429_rate,
+        "supabase_latency": args.supabase_latency,
+    }
+    port = free_port()
+    process = start_fakes(port, options)
+    try:
+        with tempfile.TemporaryDirectory(prefix="linchpin-bench-") as store:
+            configure_env(port, store)
+            result = asyncio.run(run_scenario(args, port))
+    finally:
+        process.terminate()
+
+    result = {
+        "scenario": args.scenario,
+        "commit": commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "options": {**options, "runs": args.runs, "articles": args.articles},
+        **result,
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f"{args.scenario}-{result['commit']}.json"
+    path.write_text(json.dumps(result, indent=2))
+    print(json.dumps(result, indent=2))
+    print(f"\nSaved {path}")
+    if args.compare:
+        compare(result, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import time
+
+# measured from here, so the startup breakdown includes imports
+started_at = time.perf_counter()
+
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from src import metrics, tracking
+from src.bot import bot, delivery, discord_handler
+from src.config import settings
+from src.outbox import outbox
+from src.pipeline import pipelines
+from src.scheduler import Scheduler
+from src.tracking.health import health
+from src.tracking.sources import registry
+
+# seconds per startup step, see /readyz
+startup = {"imports": round(time.perf_counter() - started_at, 3)}
+ready = False
+
+
+def tracker(name: str):
+    # resolve the tracker on first run, see src.tracking
+    async def run(**kwargs):
+        return await getattr(tracking, name)(**kwargs)
+
+    return run
+
+
+scheduler = Scheduler()
+for job_id, hours in [
+    ("sbir", settings.SCHEDULE_SBIR_HOURS),
+    ("blogs", settings.SCHEDULE_BLOGS_HOURS),
+    ("news", settings.SCHEDULE_NEWS_HOURS),
+]:
+    scheduler.add(job_id, tracker(f"track_{job_id}"), hours * 3600, jitter=600)
+
+
+def step(name: str, since: float) -> float:
+    now = time.perf_counter()
+    startup[name] = round(now - since, 3)
+    return now
+
+
+async def start():
+    global ready
+    t = time.perf_counter()
+    app.state.bot_task = asyncio.create_task(bot.start(settings.DISCORD_TOKEN))
+    # let the task get into login(), which sets up the ready event; on 3.12
+    # wait_for runs wait_until_ready() right away and it raises before that
+    await asyncio.sleep(0)
+    try:
+        await asyncio.wait_for(bot.wait_until_ready(), settings.BOT_READY_TIMEOUT)
+        print(f"Started discord bot {bot.user}")
+    except (asyncio.TimeoutError, RuntimeError) as e:
+        # messages queue up and go out once the bot connects
+        print(
+            f"Discord bot not ready after {settings.BOT_READY_TIMEOUT}s, "
+            f"continuing: {e!r}"
+        )
+    t = step("bot", t)
+
+    # posts persisted before a crash/restart but never sent
+    print(f"Replayed {outbox.replay()} undelivered posts from the outbox")
+    outbox.prune()
+    t = step("outbox", t)
+
+    if settings.SCHEDULER_ENABLED:
+        scheduler.start()
+    step("scheduler", t)
+    startup["total"] = round(time.perf_counter() - started_at, 3)
+    ready = True
+    print(f"Startup took {startup}")
+
+
+async def shutdown():
+    global ready
+    ready = False
+    await scheduler.stop()
+    discord_handler.flush_buffer()
+    try:
+        await delivery.flush(timeout=10)
+    except asyncio.TimeoutError:
+        print(f"Shutting down with undelivered messages: {delivery.stats()}")
+    print(f"Client usage: {settings.clients.stats()}")
+    # only tear down what a tracker actually loaded
+    if bb := sys.modules.get("src.bb"):
+        await bb.session_pool.close()
+    if prune := sys.modules.get("src.prune"):
+        prune.close_pool()
+    await settings.clients.close()
+    await bot.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start()
+    yield
+    await shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    bot_task = getattr(app.state, "bot_task", None)
+    checks = {
+        "startup": ready,
+        "discord": bot.is_ready(),
+        "bot_task": bot_task is not None and not bot_task.done(),
+        "scheduler": scheduler.running or not settings.SCHEDULER_ENABLED,
+    }
+    return JSONResponse(
+        {"ready": all(checks.values()), "checks": checks, "startup": startup},
+        status_code=200 if all(checks.values()) else 503,
+    )
+
+
+def run_now(job_id: str, **kwargs) -> dict:
+    started, run = scheduler.run_now(job_id, **kwargs)
+    return {"status": "success" if started else "already_running", "run": run.to_dict()}
+
+
+@app.get("/cron/tracking/sbir")
+async def cron_tracking_sbir():
+    return run_now("sbir")
+
+
+@app.get("/cron/tracking/blogs")
+async def cron_tracking_blogs():
+    return run_now("blogs", force=True)
+
+
+@app.get("/cron/tracking/news")
+async def cron_tracking_news():
+    return run_now("news", force=True)
+
+
+@app.get("/sources")
+async def list_sources():
+    return [
+        {**source, "breakers": health.status(source["url"])}
+        for source in registry.status()
+    ]
+
+
+@app.get("/jobs")
+async def list_jobs():
+    return [job.to_dict() for job in scheduler.jobs.values()]
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    if job_id not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return scheduler.jobs[job_id].to_dict(history=True)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/pipelines")
+async def list_pipelines():
+    return {name: pipeline.stats() for name, pipeline in pipelines.items()}
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    if job_id not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"cancelled": await scheduler.cancel(job_id)}
+
@@ -1,12 +1,14 @@
+import asyncio
 import os
-import time
 import zipfile
+from collections import defaultdict
 from io import BytesIO
 from pathlib import Path
 
 from browserbase.types import Extension, SessionCreateResponse
-from playwright.sync_api import ConsoleMessage, Page, sync_playwright
-from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import Browser, ConsoleMessage, Page, Playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
 
 from src.config import settings
 
@@ -48,20 +50,20 @@ def zip_extension(path: Path = PATH_TO_EXTENSION, save_local: bool = False) -> B
     return memory_zip
 
 
-def create_extension() -> str:
-    zip_data = zip_extension(save_local=True)
-    extension: Extension = settings.browserbase.extensions.create(
+async def create_extension() -> str:
+    zip_data = await asyncio.to_thread(zip_extension, save_local=True)
+    extension: Extension = await settings.async_browserbase.extensions.create(
         file=("extension.zip", zip_data.getvalue())
     )
     return extension.id
 
 
-def get_extension(id: str) -> Extension:
-    return settings.browserbase.extensions.retrieve(id)
+async def get_extension(id: str) -> Extension:
+    return await settings.async_browserbase.extensions.retrieve(id)
 
 
-def delete_extension(id: str) -> None:
-    settings.browserbase.extensions.delete(id)
+async def delete_extension(id: str) -> None:
+    await settings.async_browserbase.extensions.delete(id)
 
 
 # //////////////////////////
@@ -97,16 +99,16 @@ class SolveState:
             return
 
 
-def solve_captcha(browser_tab: Page, target_url: str):
+async def solve_captcha(browser_tab: Page, target_url: str):
     state = SolveState()
     browser_tab.on("console", state.handle_console)
-    browser_tab.goto(target_url)
+    await browser_tab.goto(target_url)
 
     try:
         # There's a chance that solving the CAPTCHA is so quick it misses the
         # end message. In this case, this function waits the 10 seconds and
         # the issue is reconciled with the "Solving mismatch" error below.
-        with browser_tab.expect_console_message(
+        async with browser_tab.expect_console_message(
             lambda msg: msg.text == SolveState.END_MSG,
             timeout=10000,
         ):
@@ -132,47 +134,189 @@ def solve_captcha(browser_tab: Page, target_url: str):
 
     # Wait for some page content to load.
     # Anything in `body` should be visible
-    browser_tab.locator("body").wait_for(state="visible")
+    await browser_tab.locator("body").wait_for(state="visible")
 
 
-def bb_get_html(
-    url: str, proxy: bool = False, captcha: bool = False, load_extension: bool = False
-) -> str:
-    with sync_playwright() as playwright:
+# //////////////////////////
+# Session pool
+# //////////////////////////
+SessionKey = tuple[bool, bool, bool]  # (proxy, captcha, load_extension)
+
+
+class BrowserSession:
+    """
+    A live Browserbase session connected over CDP, reused for several pages.
+    """
+
+    def __init__(
+        self,
+        key: SessionKey,
+        session: SessionCreateResponse,
+        browser: Browser,
+        extension_id: str | None,
+    ):
+        self.key = key
+        self.session = session
+        self.browser = browser
+        self.extension_id = extension_id
+        self.pages = 0
+
+    async def close(self) -> None:
         try:
-            if load_extension:
-                extension_id = None
-                extension_id = create_extension()
-                extension = get_extension(extension_id)
-                session: SessionCreateResponse = settings.browserbase.sessions.create(
-                    project_id=settings.BROWSERBASE_PROJECT_ID,
-                    extension_id=extension.id,
-                    proxies=proxy,
-                )
-            else:
-                session: SessionCreateResponse = settings.browserbase.sessions.create(
-                    project_id=settings.BROWSERBASE_PROJECT_ID, proxies=proxy
-                )
-
-            browser = playwright.chromium.connect_over_cdp(session.connect_url)
-            context = browser.contexts[0]
-            page = context.pages[0]
-
-            if proxy and captcha:
-                solve_captcha(page, url)
-
-            page.goto(url)
-
-            if load_extension:
-                # scroll down as some websites need to load more content
-                page.evaluate("window.scrollBy(0, window.innerHeight)")
-                time.sleep(2)
-
-            return page.content()
-        except Exception as e:
-            raise e
+            await self.browser.close()
         finally:
-            page.close()
-            browser.close()
-            if load_extension:
-                delete_extension(extension_id)
+            if self.extension_id:
+                await delete_extension(self.extension_id)
+
+
+class SessionPool:
+    """
+    Keeps warm Browserbase sessions keyed by (proxy, captcha, load_extension).
+    At most max_sessions are live at once; a session is recycled after
+    max_pages pages or as soon as a page on it fails.
+    """
+
+    def __init__(self, max_sessions: int, max_pages: int):
+        self.max_sessions = max_sessions
+        self.max_pages = max_pages
+        self._idle: dict[SessionKey, list[BrowserSession]] = defaultdict(list)
+        self._live = 0
+        self._cond = asyncio.Condition()
+        self._playwright: Playwright | None = None
+        self.created = 0
+        self.pages = 0
+
+    async def _open(self, key: SessionKey) -> BrowserSession:
+        proxy, _, load_extension = key
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+
+        extension_id = None
+        if load_extension:
+            extension_id = await create_extension()
+            extension = await get_extension(extension_id)
+            session = await settings.async_browserbase.sessions.create(
+                project_id=settings.BROWSERBASE_PROJECT_ID,
+                extension_id=extension.id,
+                proxies=proxy,
+            )
+        else:
+            session = await settings.async_browserbase.sessions.create(
+                project_id=settings.BROWSERBASE_PROJECT_ID, proxies=proxy
+            )
+
+        try:
+            browser = await self._playwright.chromium.connect_over_cdp(
+                session.connect_url
+            )
+        except Exception:
+            if extension_id:
+                await delete_extension(extension_id)
+            raise
+        self.created += 1
+        return BrowserSession(key, session, browser, extension_id)
+
+    async def acquire(self, key: SessionKey) -> BrowserSession:
+        evicted = None
+        async with self._cond:
+            while True:
+                if self._idle[key]:
+                    return self._idle[key].pop()
+                if self._live < self.max_sessions:
+                    self._live += 1
+                    break
+                # at capacity: take over the slot of an idle session with another key
+                other = next((k for k, v in self._idle.items() if v), None)
+                if other is not None:
+                    evicted = self._idle[other].pop()
+                    break
+                await self._cond.wait()
+
+        try:
+            if evicted:
+                await evicted.close()
+            return await self._open(key)
+        except BaseException:
+            async with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            raise
+
+    async def release(self, session: BrowserSession, healthy: bool) -> None:
+        session.pages += 1
+        self.pages += 1
+        if healthy and session.pages < self.max_pages:
+            async with self._cond:
+                self._idle[session.key].append(session)
+                self._cond.notify()
+            return
+
+        try:
+            await session.close()
+        finally:
+            async with self._cond:
+                self._live -= 1
+                self._cond.notify()
+
+    async def drain(self) -> None:
+        """
+        Close all idle sessions, called at the end of a run so warm sessions
+        don't keep billing between runs.
+        """
+        async with self._cond:
+            idle = [s for sessions in self._idle.values() for s in sessions]
+            self._idle.clear()
+            self._live -= len(idle)
+            self._cond.notify_all()
+        await asyncio.gather(*[s.close() for s in idle], return_exceptions=True)
+
+    async def close(self) -> None:
+        await self.drain()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def stats(self) -> dict:
+        return {
+            "live": self._live,
+            "idle": sum(len(v) for v in self._idle.values()),
+            "created": self.created,
+            "pages": self.pages,
+        }
+
+
+session_pool = SessionPool(
+    max_sessions=settings.BROWSERBASE_MAX_SESSIONS,
+    max_pages=settings.BROWSERBASE_MAX_PAGES_PER_SESSION,
+)
+
+
+async def bb_get_html(
+    url: str, proxy: bool = False, captcha: bool = False, load_extension: bool = False
+) -> str:
+    session = await session_pool.acquire((proxy, captcha, load_extension))
+    healthy = False
+    page = None
+    try:
+        page = await session.browser.contexts[0].new_page()
+
+        if proxy and captcha:
+            await solve_captcha(page, url)
+
+        await page.goto(url)
+
+        if load_extension:
+            # scroll down as some websites need to load more content
+            await page.evaluate("window.scrollBy(0, window.innerHeight)")
+            await asyncio.sleep(2)
+
+        html = await page.content()
+        healthy = True
+        return html
+    finally:
+        if page is not None:
+            try:
+                await page.close()
+            except Exception:
+                healthy = False
+        await session_pool.release(session, healthy)
@@ -1,9 +1,14 @@
 import asyncio
 import logging
+import time
+from collections import defaultdict, deque
+from typing import Callable
 
 import discord
 from fastapi import HTTPException
 
+from src import metrics
+
 intents = discord.Intents.default()
 intents.message_content = True
 bot = discord.Client(intents=intents)
@@ -29,65 +34,316 @@ async def send_embed(
     await channel.send(embed=embed)
 
 
-async def send_log(message: str, level: int):
-    CHANNEL_ID = 1314854224797896715
-    channel = bot.get_channel(CHANNEL_ID)
+# //////////////////////////
+# Delivery
+# //////////////////////////
+MAX_MESSAGE_CHARS = 2000
+MAX_EMBEDS_PER_MESSAGE = 10
+# total characters across all embeds of one message
+MAX_EMBED_CHARS = 6000
+SEND_ATTEMPTS = 4
 
-    if level == logging.ERROR:
-        # Create an embed for error messages with red color
-        embed = discord.Embed(
-            title="🚨 Error Log",
-            description=f"```diff\n{message}\n```",  # Using Discord markdown for red text
-            color=0xFF0000,  # Red color
-        )
-        await channel.send(embed=embed)
-    else:
-        await channel.send(message, suppress_embeds=True)
 
+class TokenBucket:
+    """
+    Allows `capacity` sends in a burst, refilling at `rate` sends per second.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
 
-class DiscordLogger(logging.Logger):
-    def _log(
+    async def take(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Delivery:
+    """
+    Outbound Discord queue. Producers enqueue and return immediately; one
+    background worker per channel packs queued links into as few messages as
+    possible (2000 chars, 10 embeds / 6000 embed chars) and paces sends to
+    Discord's per-channel and global limits. Failed sends are retried with
+    backoff; a packed message Discord rejects is re-sent item by item.
+    """
+
+    def __init__(
         self,
-        level,
-        msg,
-        args,
-        exc_info=None,
-        extra=None,
-        stack_info=False,
-        stacklevel=1,
-        discord=True,
+        channel_rate: float = 1,
+        channel_burst: int = 5,
+        global_rate: float = 50,
+        linger: float = 0.5,
     ):
-        # First, do normal console logging
-        super()._log(level, msg, args, exc_info, extra, stack_info, stacklevel)
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.linger = linger
+        self.global_bucket = TokenBucket(global_rate, int(global_rate))
+        self.queues: dict[int, asyncio.Queue] = {}
+        self.workers: dict[int, asyncio.Task] = {}
+        self.sent = defaultdict(int)
+        self.failed = defaultdict(int)
+
+    def _enqueue(self, channel_id: int, item: tuple) -> None:
+        if channel_id not in self.queues:
+            self.queues[channel_id] = asyncio.Queue()
+            self.workers[channel_id] = asyncio.create_task(self._worker(channel_id))
+        self.queues[channel_id].put_nowait(item)
+
+    def queue_msg(
+        self,
+        channel_id: int,
+        message: str,
+        ack: Callable[[], None] | None = None,
+        **kwargs,
+    ) -> None:
+        """
+        Queue a text line; ack is called once the message carrying it is sent.
+        """
+        self._enqueue(channel_id, ("msg", message, kwargs, ack))
+
+    def queue_embed(
+        self,
+        channel_id: int,
+        embed_title: str,
+        embed_description: str,
+        embed_url: str | None = None,
+        color: int = 0xFF23A7,
+        ack: Callable[[], None] | None = None,
+    ) -> None:
+        embed = discord.Embed(
+            title=embed_title,
+            url=embed_url,
+            description=embed_description,
+            color=color,
+        )
+        self._enqueue(channel_id, ("embed", embed, {}, ack))
+
+    @staticmethod
+    def pack(items: list[tuple]) -> list[tuple[dict, list[tuple]]]:
+        """
+        Turn queued items into (send() kwargs, items) pairs: text lines joined
+        up to the char limit (for the same send options), embeds grouped up to
+        10 at a time and 6000 characters in total.
+        """
+        packed = []
+        text, text_kwargs, text_items = "", None, []
+        for item in items:
+            kind, payload, kwargs, _ = item
+            if kind == "embed":
+                if text:
+                    packed.append(({"content": text, **text_kwargs}, text_items))
+                    text, text_items = "", []
+                embeds = packed[-1][0].get("embeds", []) if packed else []
+                if (
+                    0 < len(embeds) < MAX_EMBEDS_PER_MESSAGE
+                    and sum(map(len, embeds)) + len(payload) <= MAX_EMBED_CHARS
+                ):
+                    embeds.append(payload)
+                    packed[-1][1].append(item)
+                else:
+                    packed.append(({"embeds": [payload]}, [item]))
+                continue
+            if text and (
+                kwargs != text_kwargs
+                or len(text) + 1 + len(payload) > MAX_MESSAGE_CHARS
+            ):
+                packed.append(({"content": text, **text_kwargs}, text_items))
+                text, text_items = "", []
+            text = f"{text}\n{payload}" if text else payload[:MAX_MESSAGE_CHARS]
+            text_kwargs = kwargs
+            text_items.append(item)
+        if text:
+            packed.append(({"content": text, **text_kwargs}, text_items))
+        return packed
+
+    async def _worker(self, channel_id: int) -> None:
+        queue = self.queues[channel_id]
+        bucket = TokenBucket(self.channel_rate, self.channel_burst)
+        await bot.wait_until_ready()
+        channel = bot.get_channel(channel_id)
+        while True:
+            items = [await queue.get()]
+            # give producers a moment to add more so we can pack them together
+            await asyncio.sleep(self.linger)
+            while not queue.empty():
+                items.append(queue.get_nowait())
+
+            # (send() kwargs, items, attempt)
+            pending = deque((kwargs, group, 0) for kwargs, group in self.pack(items))
+            while pending:
+                kwargs, group, attempt = pending.popleft()
+                await bucket.take()
+                await self.global_bucket.take()
+                try:
+                    kind = "embed" if "embeds" in kwargs else "msg"
+                    with metrics.discord_send_seconds.time(kind=kind):
+                        await channel.send(**kwargs)
+                    self.sent[channel_id] += 1
+                except discord.HTTPException as e:
+                    if 400 <= e.status < 500 and len(group) > 1:
+                        # rejected as a whole, try its items on their own
+                        metrics.retries.inc(service="discord", reason="rejected")
+                        pending.extendleft(
+                            (kwargs, [item], 0)
+                            for item in reversed(group)
+                            for kwargs, _ in self.pack([item])
+                        )
+                    elif (
+                        e.status == 429 or e.status >= 500
+                    ) and attempt + 1 < SEND_ATTEMPTS:
+                        await self._retry(pending, kwargs, group, attempt)
+                    else:
+                        self._failed(channel_id, e)
+                    continue
+                except Exception as e:
+                    if attempt + 1 < SEND_ATTEMPTS:
+                        await self._retry(pending, kwargs, group, attempt)
+                    else:
+                        self._failed(channel_id, e)
+                    continue
+                for _, _, _, ack in group:
+                    if ack:
+                        ack()
+            for _ in items:
+                queue.task_done()
+
+    @staticmethod
+    async def _retry(pending: deque, kwargs: dict, group: list, attempt: int) -> None:
+        metrics.retries.inc(service="discord", reason="error")
+        await asyncio.sleep(2**attempt)
+        pending.appendleft((kwargs, group, attempt + 1))
+
+    def _failed(self, channel_id: int, e: Exception) -> None:
+        # unacked posts stay in the outbox and are replayed on the next start
+        self.failed[channel_id] += 1
+        print(f"Could not deliver to {channel_id}: {e}")
 
-        # If discord flag is True, send to Discord
-        if discord:
-            formatted_msg = self.handlers[0].formatter.format(
-                logging.LogRecord(self.name, level, "", 0, msg, args, exc_info, None)
+    async def flush(self, timeout: float | None = None) -> None:
+        await asyncio.wait_for(
+            asyncio.gather(*[q.join() for q in self.queues.values()]), timeout
+        )
+
+    def stats(self) -> dict:
+        return {
+            "queued": {c: q.qsize() for c, q in self.queues.items()},
+            "sent": dict(self.sent),
+            "failed": dict(self.failed),
+        }
+
+
+delivery = Delivery()
+
+
+# //////////////////////////
+# Logging
+# //////////////////////////
+LOG_CHANNEL_ID = 1314854224797896715
+MAX_EMBED_DESCRIPTION = 4096
+
+
+class DiscordHandler(logging.Handler):
+    """
+    Sends log records to the log channel without blocking the caller.
+    emit() only appends to a bounded buffer; a single background task drains
+    it every `interval` seconds into batched messages via `delivery`.
+    When the buffer is full new non-error records are dropped and errors evict
+    the oldest record, the drop count is reported with the next batch.
+    """
+
+    def __init__(self, capacity: int = 1000, interval: float = 2.0):
+        super().__init__()
+        self.capacity = capacity
+        self.interval = interval
+        self.buffer: deque[tuple[int, str]] = deque()
+        self.dropped = 0
+        self._task: asyncio.Task | None = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if len(self.buffer) >= self.capacity:
+            self.dropped += 1
+            if record.levelno < logging.ERROR:
+                return
+            self.buffer.popleft()
+        try:
+            self.buffer.append((record.levelno, self.format(record)))
+        except Exception:
+            self.handleError(record)
+        self._ensure_flusher()
+
+    def _ensure_flusher(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # not on the event loop, the record waits for the next one that is
+            return
+        self._task = loop.create_task(self._flush_forever())
+
+    async def _flush_forever(self) -> None:
+        await bot.wait_until_ready()
+        while True:
+            self.flush_buffer()
+            await asyncio.sleep(self.interval)
+
+    def flush_buffer(self) -> None:
+        records = [self.buffer.popleft() for _ in range(len(self.buffer))]
+        if self.dropped:
+            records.append(
+                (logging.WARNING, f"WARNING:    dropped {self.dropped} log records")
             )
+            self.dropped = 0
 
-            # Get or create event loop
-            try:
-                loop = asyncio.get_running_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
-            # Schedule the coroutine to run
-            if loop.is_running():
-                # If we're already in an async context, create_task is safe
-                loop.create_task(send_log(formatted_msg, level))
+        errors = []
+        for level, message in records:
+            if level >= logging.ERROR:
+                errors.append(message)
             else:
-                # If we're not in an async context, run the coroutine
-                loop.run_until_complete(send_log(formatted_msg, level))
+                delivery.queue_msg(LOG_CHANNEL_ID, message, suppress_embeds=True)
+
+        # one embed per batch of errors, split to fit the description limit
+        description = ""
+        for message in errors:
+            message = message[: MAX_EMBED_DESCRIPTION - 20]
+            if len(description) + len(message) + 20 > MAX_EMBED_DESCRIPTION:
+                self._queue_errors(description)
+                description = ""
+            description = f"{description}\n{message}" if description else message
+        if description:
+            self._queue_errors(description)
+
+    @staticmethod
+    def _queue_errors(description: str) -> None:
+        delivery.queue_embed(
+            LOG_CHANNEL_ID,
+            "🚨 Error Log",
+            f"```diff\n{description}\n```",  # Using Discord markdown for red text
+            color=0xFF0000,  # Red color
+        )
+
+
+discord_handler = DiscordHandler()
+discord_handler.setFormatter(logging.Formatter("%(levelname)s:    %(message)s"))
 
 
 def setup_logger(name=__name__, level=logging.INFO):
-    # Set logger class
-    logger = DiscordLogger(name)
+    logger = logging.getLogger(name)
     logger.setLevel(level)
+    logger.propagate = False
 
-    # Add console handler if it doesn't exist
+    # Add console and discord handlers if they don't exist
     if not logger.handlers:
         console_handler = logging.StreamHandler()
         console_handler.setLevel(level)
@@ -96,7 +352,8 @@ def setup_logger(name=__name__, level=logging.INFO):
         formatter = logging.Formatter("%(levelname)s:    %(message)s")
         console_handler.setFormatter(formatter)
 
-        # Add handler to the logger
+        # Add handlers to the logger
         logger.addHandler(console_handler)
+        logger.addHandler(discord_handler)
 
     return logger
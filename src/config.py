@@ -1,8 +1,76 @@
-import instructor
-from browserbase import Browserbase
-from openai import AsyncOpenAI
+import inspect
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any, Callable
+
+import httpx
+from pydantic import PrivateAttr
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from supabase import Client, create_client
+
+# the sdk clients are imported when first built, not at startup
+if TYPE_CHECKING:
+    import instructor
+    from browserbase import AsyncBrowserbase, Browserbase
+    from postgrest import AsyncPostgrestClient
+
+
+class ClientRegistry:
+    """
+    Long-lived clients shared by every task. Each client is built lazily on
+    first access and reused until close() on app shutdown.
+    Counts accesses and http requests per client so reuse can be checked.
+    """
+
+    def __init__(self):
+        self._clients: dict[str, Any] = {}
+        self.created = Counter()
+        self.accesses = Counter()
+        self.requests = Counter()
+        self.response_listeners: dict[str, list[Callable]] = defaultdict(list)
+
+    def get(self, name: str, factory: Callable[[], Any]) -> Any:
+        self.accesses[name] += 1
+        if name not in self._clients:
+            self._clients[name] = factory()
+            self.created[name] += 1
+        return self._clients[name]
+
+    def event_hooks(self, name: str) -> dict:
+        """
+        httpx hooks counting requests and passing responses to listeners
+        registered with on_response, e.g. the LLM limiter reading rate limits.
+        """
+
+        async def on_request(request: httpx.Request) -> None:
+            self.requests[name] += 1
+
+        async def on_response(response: httpx.Response) -> None:
+            for listener in self.response_listeners[name]:
+                listener(response)
+
+        return {"request": [on_request], "response": [on_response]}
+
+    def on_response(self, name: str, listener: Callable[[httpx.Response], None]):
+        self.response_listeners[name].append(listener)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "created": self.created[name],
+                "accesses": self.accesses[name],
+                "requests": self.requests[name],
+            }
+            for name in self.created
+        }
+
+    async def close(self) -> None:
+        clients, self._clients = self._clients, {}
+        for name, client in clients.items():
+            if name == "async_openai":
+                await client.client.close()
+            elif hasattr(client, "aclose"):
+                await client.aclose()
+            elif inspect.isawaitable(closed := client.close()):
+                await closed
 
 
 class Settings(BaseSettings):
@@ -18,20 +86,190 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     JINA_API_KEY: str
 
-    @property
-    def browserbase(self):
-        return Browserbase(api_key=self.BROWSERBASE_API_KEY)
+    # in-process scheduler, the /cron endpoints still trigger runs on demand.
+    # news and blogs jobs only poll the sources that are due, see src.tracking.sources
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULE_NEWS_HOURS: float = 1
+    SCHEDULE_BLOGS_HOURS: float = 3
+    SCHEDULE_SBIR_HOURS: float = 24
+
+    # tracking runs: concurrent fetches, per-host limit, per-source fetch
+    # timeout (seconds, whole fallback chain) and workers for later stages
+    TRACKING_CONCURRENCY: int = 8
+    TRACKING_HOST_CONCURRENCY: int = 1
+    TRACKING_SOURCE_TIMEOUT: float = 300
+    PIPELINE_EXTRACT_WORKERS: int = 4
+    PIPELINE_PERSIST_WORKERS: int = 2
+
+    # per-stage timeouts (seconds) and per source/strategy circuit breakers
+    FETCH_TIMEOUT: float = 120
+    EXTRACT_TIMEOUT: float = 180
+    PERSIST_TIMEOUT: float = 60
+    BREAKER_FAILURE_THRESHOLD: int = 3
+    BREAKER_COOLDOWN: float = 6 * 3600
+
+    # shared outbound http client
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE: int = 20
+    HTTP_TIMEOUT: float = 60
+    HTTP_RETRIES: int = 3
+
+    # supabase: rows per bulk write, concurrent writes and rows per page on reads
+    SUPABASE_TIMEOUT: float = 60
+    SUPABASE_CHUNK: int = 500
+    SUPABASE_WRITE_CONCURRENCY: int = 4
+    SUPABASE_PAGE_SIZE: int = 1000
+
+    # openai connection pool
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE: int = 20
+    OPENAI_TIMEOUT: float = 120
+
+    # adaptive llm concurrency (AIMD window bounds) and tokens-per-minute budget
+    LLM_INITIAL_CONCURRENCY: int = 16
+    LLM_MIN_CONCURRENCY: int = 1
+    LLM_MAX_CONCURRENCY: int = 128
+    LLM_TPM_LIMIT: int = 2_000_000
+    LLM_MAX_RETRIES: int = 6
+
+    # local llm response cache: entry lifetime in seconds and max entries
+    LLM_CACHE_TTL: float = 7 * 24 * 3600
+    LLM_CACHE_MAX_ENTRIES: int = 50_000
+
+    # article extraction: tokens per llm chunk, overlap between chunks and
+    # default cap on a page's total tokens (sources can set "max_tokens")
+    EXTRACT_CHUNK_TOKENS: int = 12_000
+    EXTRACT_CHUNK_OVERLAP: int = 300
+    EXTRACT_MAX_TOKENS: int = 60_000
+    # stream articles out of the LLM one by one instead of waiting for the
+    # whole response, so each reaches dedup and discord as soon as it's ready
+    EXTRACT_STREAMING: bool = True
+    # streamed articles are persisted and embedded in batches of up to this
+    # many, a batch waits at most EXTRACT_STREAM_LINGER seconds for more
+    EXTRACT_STREAM_BATCH: int = 20
+    EXTRACT_STREAM_LINGER: float = 0.5
+
+    # cross-source near-duplicate headlines: embedding model and size, cosine
+    # similarity above which a headline from another source is dropped, days of
+    # headlines kept in the index and inputs per embeddings request
+    NEAR_DUP_ENABLED: bool = True
+    NEAR_DUP_THRESHOLD: float = 0.88
+    NEAR_DUP_WINDOW_DAYS: float = 7
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_DIMENSIONS: int = 256
+    EMBEDDING_BATCH: int = 256
+
+    # worker processes for html pruning + markdownify
+    HTML_WORKERS: int = 2
+
+    # sqlite files for local state (fingerprints, indexes, caches)
+    LOCAL_STORE_DIR: str = "tmp"
+
+    # sbir ingestion: rows per upsert request, days of overlap on the
+    # open_date_from watermark and days between full downloads
+    SBIR_UPSERT_CHUNK: int = 500
+    SBIR_WATERMARK_OVERLAP_DAYS: int = 2
+    SBIR_FULL_REFRESH_DAYS: int = 7
+
+    # sbir summaries: pack several topics per request, bounded by topic count
+    # and an estimated prompt token budget
+    SBIR_BATCH_SUMMARIES: bool = True
+    SBIR_BATCH_SIZE: int = 20
+    SBIR_BATCH_TOKEN_BUDGET: int = 16_000
+    SBIR_BATCH_COMPLETION_TOKENS_PER_TOPIC: int = 300
+
+    # seconds to wait for the discord bot to be ready on startup
+    BOT_READY_TIMEOUT: float = 30
+
+    # browserbase session pool
+    BROWSERBASE_MAX_SESSIONS: int = 3
+    BROWSERBASE_MAX_PAGES_PER_SESSION: int = 20
+
+    _clients: ClientRegistry = PrivateAttr(default_factory=ClientRegistry)
 
     @property
-    def supabase_client(self) -> Client:
-        return create_client(self.SUPABASE_URL, self.SUPABASE_KEY)
+    def clients(self) -> ClientRegistry:
+        return self._clients
 
     @property
-    def async_openai_client(self):
-        return instructor.from_openai(
-            client=AsyncOpenAI(api_key=self.OPENAI_API_KEY),
+    def http_client(self) -> httpx.AsyncClient:
+        return self._clients.get(
+            "http",
+            lambda: httpx.AsyncClient(
+                http2=True,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=self.HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=60,
+                ),
+                timeout=httpx.Timeout(self.HTTP_TIMEOUT, connect=10),
+                event_hooks=self._clients.event_hooks("http"),
+            ),
         )
 
+    @property
+    def browserbase(self) -> "Browserbase":
+        def create():
+            from browserbase import Browserbase
+
+            return Browserbase(api_key=self.BROWSERBASE_API_KEY)
+
+        return self._clients.get("browserbase", create)
+
+    @property
+    def async_browserbase(self) -> "AsyncBrowserbase":
+        def create():
+            from browserbase import AsyncBrowserbase
+
+            return AsyncBrowserbase(api_key=self.BROWSERBASE_API_KEY)
+
+        return self._clients.get("async_browserbase", create)
+
+    @property
+    def supabase_client(self) -> "AsyncPostgrestClient":
+        """
+        Async PostgREST client for the Supabase database, see src.repository.
+        """
+
+        def create():
+            from postgrest import AsyncPostgrestClient
+
+            return AsyncPostgrestClient(
+                f"{self.SUPABASE_URL}/rest/v1",
+                headers={
+                    "apikey": self.SUPABASE_KEY,
+                    "Authorization": f"Bearer {self.SUPABASE_KEY}",
+                },
+                timeout=self.SUPABASE_TIMEOUT,
+            )
+
+        return self._clients.get("supabase", create)
+
+    @property
+    def async_openai_client(self) -> "instructor.AsyncInstructor":
+        def create():
+            import instructor
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            return instructor.from_openai(
+                client=AsyncOpenAI(
+                    api_key=self.OPENAI_API_KEY,
+                    timeout=self.OPENAI_TIMEOUT,
+                    # retries and backoff are handled by src.llm's limiter
+                    max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=self.OPENAI_MAX_CONNECTIONS,
+                            max_keepalive_connections=self.OPENAI_MAX_KEEPALIVE,
+                        ),
+                        event_hooks=self._clients.event_hooks("async_openai"),
+                    ),
+                ),
+            )
+
+        return self._clients.get("async_openai", create)
+
     model_config = SettingsConfigDict(env_file=".env")
 
 
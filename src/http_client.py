@@ -0,0 +1,76 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import httpx
+
+from src import metrics
+from src.config import settings
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Shared async client for every outbound fetch: keep-alive pool, HTTP/2 where
+    the origin supports it and default timeouts. Owned by settings.clients.
+    """
+    return settings.http_client
+
+
+def _backoff(attempt: int, response: httpx.Response | None = None) -> float:
+    # honour Retry-After when the server gives it, otherwise exponential + jitter
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+    return min(2**attempt, 30) + random.uniform(0, 1)
+
+
+async def request(
+    method: str, url: str, retries: int | None = None, **kwargs
+) -> httpx.Response:
+    """
+    Send a request through the shared client, retrying transport errors and
+    429/5xx responses with backoff. Raises for the final non-2xx response.
+    """
+    retries = settings.HTTP_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            response = await get_client().request(method, url, **kwargs)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+            metrics.retries.inc(service="http", reason="transport")
+            await asyncio.sleep(_backoff(attempt))
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            metrics.retries.inc(service="http", reason=str(response.status_code))
+            await asyncio.sleep(_backoff(attempt, response))
+            continue
+
+        response.raise_for_status()
+        return response
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
+
+
+@asynccontextmanager
+async def stream(method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+    """
+    Stream a response body through the shared client. No retries since the
+    body may already be partly consumed; raises for non-2xx.
+    """
+    async with get_client().stream(method, url, **kwargs) as response:
+        if not response.is_success:
+            await response.aread()
+            response.raise_for_status()
+        yield response
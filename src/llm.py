@@ -0,0 +1,445 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import AsyncIterator, TypeVar
+
+import httpx
+import openai
+from pydantic import BaseModel, RootModel, ValidationError
+
+from src import local_store, metrics
+from src.config import settings
+
+T = TypeVar("T", bound=BaseModel)
+
+# rough local estimate, ~4 characters per token for English text
+CHARS_PER_TOKEN = 4
+DEFAULT_COMPLETION_TOKENS = 1000
+DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+WHITESPACE = re.compile(r"\s+")
+# a single attempt per instructor call: its own retry loop would re-send a
+# throttled request straight away, inside the same limiter slot
+INSTRUCTOR_ATTEMPTS = 1
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def parse_duration(value: str) -> float:
+    """
+    Seconds in an OpenAI reset header such as "1s", "6m0s" or "20ms".
+    """
+    return sum(float(n) * UNITS[unit] for n, unit in DURATION.findall(value))
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limiter shared by every OpenAI call. The concurrency window grows by
+    1/window per success and halves on a 429. A tokens-per-minute bucket is
+    kept in step with the x-ratelimit-* response headers, and when the headers
+    say a budget is exhausted new calls wait until it resets.
+    """
+
+    def __init__(
+        self, initial: int, min_window: int, max_window: int, tokens_per_minute: int
+    ):
+        self.window = float(initial)
+        self.min_window = min_window
+        self.max_window = max_window
+        self.tpm = tokens_per_minute
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.waiting = 0
+        self.throttled = 0
+        self.completed = 0
+        self._cond = asyncio.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.tpm, self.tokens + (now - self.updated) * self.tpm / 60)
+        self.updated = now
+
+    async def acquire(self, tokens: int) -> None:
+        tokens = min(tokens, self.tpm)
+        async with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    self._refill()
+                    delay = self.paused_until - time.monotonic()
+                    if delay <= 0 and self.tokens < tokens:
+                        delay = (tokens - self.tokens) * 60 / self.tpm
+                    if delay > 0:
+                        # wake early if a release changes the picture
+                        try:
+                            await asyncio.wait_for(self._cond.wait(), delay)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    if self.in_flight < int(self.window):
+                        break
+                    await self._cond.wait()
+            finally:
+                self.waiting -= 1
+            self.tokens -= tokens
+            self.in_flight += 1
+
+    async def release(self, success: bool = True, throttled: bool = False) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.window = max(self.min_window, self.window / 2)
+            elif success:
+                self.completed += 1
+                self.window = min(self.max_window, self.window + 1 / self.window)
+            self._cond.notify_all()
+
+    def observe(self, response: httpx.Response) -> None:
+        """
+        Sync the budget with OpenAI's rate limit headers.
+        """
+        headers = response.headers
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens and remaining_tokens.isdigit():
+            self._refill()
+            self.tokens = min(self.tokens, float(remaining_tokens))
+
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = headers.get(f"x-ratelimit-reset-{kind}")
+            if remaining == "0" and reset:
+                self.paused_until = max(
+                    self.paused_until, time.monotonic() + parse_duration(reset)
+                )
+
+        if response.status_code == 429 and (retry_after := headers.get("retry-after")):
+            try:
+                self.paused_until = max(
+                    self.paused_until, time.monotonic() + float(retry_after)
+                )
+            except ValueError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "window": round(self.window, 2),
+            "in_flight": self.in_flight,
+            "queued": self.waiting,
+            "tokens_available": int(self.tokens),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+            "completed": self.completed,
+            "throttled": self.throttled,
+        }
+
+
+limiter = AdaptiveLimiter(
+    initial=settings.LLM_INITIAL_CONCURRENCY,
+    min_window=settings.LLM_MIN_CONCURRENCY,
+    max_window=settings.LLM_MAX_CONCURRENCY,
+    tokens_per_minute=settings.LLM_TPM_LIMIT,
+)
+settings.clients.on_response("async_openai", limiter.observe)
+
+
+class ResponseCache:
+    """
+    On-disk cache of structured responses keyed on model, response_model
+    schema, whitespace-normalized messages and call options. Entries expire
+    after `ttl` seconds and the least recently used are evicted past
+    `max_entries`.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self.conn = local_store.connect("llm_cache")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT,
+                created_at REAL,
+                accessed_at REAL
+            )
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def key(
+        model: str, response_model: type[BaseModel], messages: list[dict], **kwargs
+    ) -> str:
+        normalized = [
+            {**m, "content": WHITESPACE.sub(" ", m["content"]).strip()}
+            for m in messages
+        ]
+        payload = json.dumps(
+            {
+                "model": model,
+                "schema": response_model.model_json_schema(),
+                "messages": normalized,
+                "kwargs": kwargs,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str, response_model: type[T]) -> T | None:
+        row = self.conn.execute(
+            "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row["created_at"] > self.ttl:
+            self.misses += 1
+            return None
+        self.conn.execute(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key)
+        )
+        self.conn.commit()
+        self.hits += 1
+        return response_model.model_validate_json(row["response"])
+
+    def put(self, key: str, response: BaseModel) -> None:
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+            (key, response.model_dump_json(), now, now),
+        )
+        self._puts += 1
+        if self._puts % 100 == 0:
+            self.evict()
+        self.conn.commit()
+
+    def evict(self) -> None:
+        self.conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+        )
+        self.conn.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "size": self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0],
+        }
+
+
+cache = ResponseCache(
+    ttl=settings.LLM_CACHE_TTL, max_entries=settings.LLM_CACHE_MAX_ENTRIES
+)
+
+
+def _cause(e: BaseException, *types: type) -> BaseException | None:
+    # instructor may wrap the openai error, so look down the chain
+    while e is not None:
+        if isinstance(e, types):
+            return e
+        e = e.__cause__ or e.__context__
+    return None
+
+
+def _backoff(attempt: int) -> float:
+    # full jitter so throttled callers don't retry in lockstep
+    return random.uniform(0, min(2**attempt, 60))
+
+
+async def _retry(e: Exception, attempt: int) -> bool:
+    """
+    Give back the limiter slot for a failed call and, if the failure is
+    throttling, transient or a response that didn't validate and retries are
+    left, back off before the retry.
+    """
+    throttled = _cause(e, openai.RateLimitError) is not None
+    transient = _cause(e, openai.APIConnectionError, openai.InternalServerError)
+    invalid = _cause(e, ValidationError, json.JSONDecodeError)
+    await limiter.release(success=False, throttled=throttled)
+    if (throttled or transient or invalid) and attempt < settings.LLM_MAX_RETRIES:
+        reason = "throttled" if throttled else "transient" if transient else "invalid"
+        metrics.retries.inc(service="openai", reason=reason)
+        await asyncio.sleep(_backoff(attempt))
+        return True
+    return False
+
+
+def _observe(call: str, model: str, seconds: float, prompt: int, completion: int):
+    source = metrics.current_source.get()
+    metrics.llm_seconds.observe(seconds, source=source, model=model, call=call)
+    metrics.llm_tokens.observe(prompt, source=source, model=model, kind="prompt")
+    if completion:
+        metrics.llm_tokens.observe(
+            completion, source=source, model=model, kind="completion"
+        )
+
+
+async def complete(
+    response_model: type[T],
+    messages: list[dict],
+    model: str = "gpt-4o-mini",
+    use_cache: bool = True,
+    **kwargs,
+) -> T:
+    """
+    Structured completion through the response cache and the shared limiter.
+    Throttled and transient failures are retried with jittered backoff instead
+    of being dropped.
+    """
+    if use_cache:
+        key = cache.key(model, response_model, messages, **kwargs)
+        if (cached := cache.get(key, response_model)) is not None:
+            return cached
+
+    tokens = sum(estimate_tokens(m["content"]) for m in messages) + kwargs.get(
+        "max_tokens", DEFAULT_COMPLETION_TOKENS
+    )
+    for attempt in range(settings.LLM_MAX_RETRIES + 1):
+        await limiter.acquire(tokens)
+        start = time.perf_counter()
+        try:
+            client = settings.async_openai_client
+            result, completion = await client.chat.completions.create_with_completion(
+                model=model,
+                response_model=response_model,
+                messages=messages,
+                max_retries=INSTRUCTOR_ATTEMPTS,
+                **kwargs,
+            )
+        except Exception as e:
+            if await _retry(e, attempt):
+                continue
+            raise
+        await limiter.release()
+        if usage := completion.usage:
+            _observe(
+                "complete",
+                model,
+                time.perf_counter() - start,
+                usage.prompt_tokens,
+                usage.completion_tokens,
+            )
+        if use_cache:
+            cache.put(key, result)
+        return result
+
+
+async def stream(
+    response_model: type[T],
+    messages: list[dict],
+    model: str = "gpt-4o-mini",
+    use_cache: bool = True,
+    **kwargs,
+) -> AsyncIterator[T]:
+    """
+    Like complete(), for a list of response_model items: each item is yielded
+    as soon as the model has generated it (instructor's create_iterable),
+    instead of after the whole response. A retry after a partial stream skips
+    the items already yielded, matched by content since the order of a new
+    response can differ.
+    """
+    items_model = RootModel[list[response_model]]
+    if use_cache:
+        key = cache.key(model, response_model, messages, iterable=True, **kwargs)
+        if (cached := cache.get(key, items_model)) is not None:
+            for item in cached.root:
+                yield item
+            return
+
+    tokens = sum(estimate_tokens(m["content"]) for m in messages) + kwargs.get(
+        "max_tokens", DEFAULT_COMPLETION_TOKENS
+    )
+    items, yielded = [], set()
+    for attempt in range(settings.LLM_MAX_RETRIES + 1):
+        await limiter.acquire(tokens)
+        start = time.perf_counter()
+        try:
+            response = settings.async_openai_client.chat.completions.create_iterable(
+                model=model,
+                response_model=response_model,
+                messages=messages,
+                max_retries=INSTRUCTOR_ATTEMPTS,
+                **kwargs,
+            )
+            async for item in response:
+                if (dump := item.model_dump_json()) not in yielded:
+                    yielded.add(dump)
+                    items.append(item)
+                    yield item
+        except Exception as e:
+            if await _retry(e, attempt):
+                continue
+            raise
+        except BaseException:
+            # the caller stopped reading or was cancelled mid-stream
+            await limiter.release(success=False)
+            raise
+        await limiter.release()
+        # streamed responses carry no usage, so tokens are estimated
+        _observe(
+            "stream",
+            model,
+            time.perf_counter() - start,
+            tokens - kwargs.get("max_tokens", DEFAULT_COMPLETION_TOKENS),
+            estimate_tokens(items_model(items).model_dump_json()),
+        )
+        if use_cache:
+            cache.put(key, items_model(items))
+        return
+
+
+async def embed(
+    texts: list[str],
+    model: str = "text-embedding-3-small",
+    dimensions: int | None = None,
+) -> list[list[float]]:
+    """
+    Embeddings for texts, EMBEDDING_BATCH inputs per request, through the
+    shared limiter with the same retries as complete().
+    """
+    size = settings.EMBEDDING_BATCH
+    batches = [texts[i : i + size] for i in range(0, len(texts), size)]
+    options = {"dimensions": dimensions} if dimensions else {}
+
+    async def embed_batch(batch: list[str]) -> list[list[float]]:
+        tokens = sum(estimate_tokens(t) for t in batch)
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            await limiter.acquire(tokens)
+            start = time.perf_counter()
+            try:
+                response = await settings.async_openai_client.client.embeddings.create(
+                    model=model, input=batch, **options
+                )
+            except Exception as e:
+                if await _retry(e, attempt):
+                    continue
+                raise
+            await limiter.release()
+            _observe(
+                "embed",
+                model,
+                time.perf_counter() - start,
+                response.usage.prompt_tokens,
+                0,
+            )
+            return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+    results = await asyncio.gather(*[embed_batch(b) for b in batches])
+    return [vector for batch in results for vector in batch]
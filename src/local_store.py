@@ -0,0 +1,25 @@
+import sqlite3
+from pathlib import Path
+
+from src.config import settings
+
+
+def path(filename: str) -> Path:
+    """
+    Path of a file under LOCAL_STORE_DIR, creating the directory if needed.
+    """
+    directory = Path(settings.LOCAL_STORE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / filename
+
+
+def connect(name: str) -> sqlite3.Connection:
+    """
+    Open (creating if needed) a small sqlite database under LOCAL_STORE_DIR.
+    Used for local state that should survive between runs.
+    """
+    conn = sqlite3.connect(path(f"{name}.sqlite3"), check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,171 @@
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+# source being worked on by the current task, used as a label by code that
+# doesn't know which source it's serving (llm calls, supabase writes)
+current_source: ContextVar[str] = ContextVar("current_source", default="")
+
+# seconds, from a fast jina fetch to a slow browserbase run
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_BUCKETS = (100, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        self._lock = Lock()
+        registry.append(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> list[str]: ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, key)} {value}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: bucket counts (non-cumulative, last is +Inf), sum
+        self.values: dict[tuple[str, ...], tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            empty = ([0] * (len(self.buckets) + 1), 0.0)
+            counts, total = self.values.get(key, empty)
+            i = bisect_left(self.buckets, value)
+            counts[i] += 1
+            self.values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _labels(self.labelnames, key, le=le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+registry: list[Metric] = []
+
+
+def render() -> str:
+    """
+    Every metric in the Prometheus text exposition format, for /metrics.
+    """
+    return "\n".join(m.render() for m in registry) + "\n"
+
+
+fetch_seconds = Histogram(
+    "linchpin_fetch_seconds",
+    "Page fetch latency per source and strategy",
+    ("source", "strategy", "result"),
+)
+markdown_cpu_seconds = Histogram(
+    "linchpin_markdown_cpu_seconds",
+    "CPU time pruning and markdownifying html on a worker process",
+    ("source",),
+)
+llm_seconds = Histogram(
+    "linchpin_llm_seconds",
+    "OpenAI request latency per source and call",
+    ("source", "model", "call"),
+)
+llm_tokens = Histogram(
+    "linchpin_llm_tokens",
+    "Tokens per OpenAI request and source",
+    ("source", "model", "kind"),
+    buckets=TOKEN_BUCKETS,
+)
+supabase_seconds = Histogram(
+    "linchpin_supabase_seconds",
+    "Supabase round-trip time per table and operation",
+    ("table", "op"),
+)
+discord_send_seconds = Histogram(
+    "linchpin_discord_send_seconds", "Discord message send latency", ("kind",)
+)
+stage_seconds = Histogram(
+    "linchpin_stage_seconds",
+    "Time per item in each pipeline stage",
+    ("pipeline", "stage"),
+)
+articles = Counter(
+    "linchpin_articles_total",
+    "Extracted articles per source by outcome (new, seen, existing, near_duplicate)",
+    ("source", "result"),
+)
+errors = Counter(
+    "linchpin_errors_total", "Failed items per pipeline stage", ("pipeline", "stage")
+)
+retries = Counter(
+    "linchpin_retries_total",
+    "Retried requests per service and reason",
+    ("service", "reason"),
+)
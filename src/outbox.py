@@ -0,0 +1,90 @@
+import json
+import time
+
+from src import local_store
+from src.bot import delivery
+
+# (id, channel_id, kind, payload) where kind is "msg" or "embed" and payload
+# holds the keyword arguments for delivery.queue_msg / queue_embed
+Post = tuple[int, int, str, dict]
+
+
+class Outbox:
+    """
+    Durable record of Discord posts for rows already persisted to Supabase.
+    A post is marked delivered once Discord accepts it; anything left
+    undelivered is re-queued by replay() after a restart.
+    """
+
+    def __init__(self):
+        self.conn = local_store.connect("outbox")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id INTEGER,
+                kind TEXT,
+                payload TEXT,
+                created_at REAL,
+                delivered_at REAL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def add(self, posts: list[tuple[int, str, dict]]) -> list[Post]:
+        now = time.time()
+        added = []
+        for channel_id, kind, payload in posts:
+            cursor = self.conn.execute(
+                """
+                INSERT INTO outbox (channel_id, kind, payload, created_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (channel_id, kind, json.dumps(payload), now),
+            )
+            added.append((cursor.lastrowid, channel_id, kind, payload))
+        self.conn.commit()
+        return added
+
+    def mark_delivered(self, id: int) -> None:
+        self.conn.execute(
+            "UPDATE outbox SET delivered_at = ? WHERE id = ?", (time.time(), id)
+        )
+        self.conn.commit()
+
+    def discard(self, ids: list[int]) -> None:
+        """
+        Drop posts that turned out not to be needed before they were sent.
+        """
+        self.conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+        self.conn.commit()
+
+    def send(self, post: Post) -> None:
+        id, channel_id, kind, payload = post
+        queue = delivery.queue_embed if kind == "embed" else delivery.queue_msg
+        queue(channel_id, ack=lambda: self.mark_delivered(id), **payload)
+
+    def pending(self) -> list[Post]:
+        rows = self.conn.execute(
+            """
+            SELECT id, channel_id, kind, payload FROM outbox
+            WHERE delivered_at IS NULL ORDER BY id
+            """
+        ).fetchall()
+        return [(r[0], r[1], r[2], json.loads(r[3])) for r in rows]
+
+    def replay(self) -> int:
+        pending = self.pending()
+        for post in pending:
+            self.send(post)
+        return len(pending)
+
+    def prune(self, days: float = 7) -> None:
+        self.conn.execute(
+            "DELETE FROM outbox WHERE delivered_at < ?", (time.time() - days * 86400,)
+        )
+        self.conn.commit()
+
+
+outbox = Outbox()
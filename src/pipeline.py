@@ -0,0 +1,192 @@
+import asyncio
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+
+from src import metrics
+from src.bot import setup_logger
+
+logger = setup_logger(__name__)
+
+# a handler turns one item into zero or more items for the next stage, either
+# by returning an iterable or by yielding from an async generator
+Handler = Callable[[Any], Awaitable[Iterable[Any] | None] | AsyncIterable[Any]]
+
+# the latest pipeline per name, running or finished
+pipelines: dict[str, "Pipeline"] = {}
+
+
+async def batched(
+    items: AsyncIterator[Any], size: int, linger: float
+) -> AsyncIterator[list[Any]]:
+    """
+    Group items from an async iterator into lists of up to size, yielding a
+    shorter list once its first item has waited linger seconds.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    error: list[Exception] = []
+
+    async def produce() -> None:
+        try:
+            async for item in items:
+                await queue.put(item)
+        except Exception as e:
+            error.append(e)
+        finally:
+            await queue.put(done)
+
+    producer = asyncio.create_task(produce())
+    try:
+        finished = False
+        while not finished:
+            item = await queue.get()
+            if item is done:
+                break
+            batch = [item]
+            deadline = time.monotonic() + linger
+            while len(batch) < size:
+                try:
+                    item = await asyncio.wait_for(
+                        queue.get(), deadline - time.monotonic()
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if item is done:
+                    finished = True
+                    break
+                batch.append(item)
+            yield batch
+        if error:
+            raise error[0]
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+class Stage:
+    def __init__(
+        self, name: str, handler: Handler, workers: int = 1, maxsize: int = 0
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        # items waiting for this stage, 0 defaults to 2x workers
+        self.maxsize = maxsize or workers * 2
+        self.queue: asyncio.Queue | None = None
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.emitted = 0
+        self.seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "depth": self.queue.qsize() if self.queue else 0,
+            "maxsize": self.maxsize,
+            "busy": self.busy,
+            "processed": self.processed,
+            "failed": self.failed,
+            "emitted": self.emitted,
+            "seconds": round(self.seconds, 2),
+        }
+
+
+class Pipeline:
+    """
+    Chains stages with bounded queues. Every stage runs its own workers, so
+    stages overlap and a run goes as fast as the slowest stage; a full queue
+    blocks the stage before it (backpressure). A failed item is logged via
+    describe(item) and dropped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        stages: list[Stage],
+        describe: Callable[[Any], str] = repr,
+        on_error: Callable[[Any, Exception], None] | None = None,
+    ):
+        self.name = name
+        self.stages = stages
+        self.describe = describe
+        self.on_error = on_error
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    async def _emit(self, index: int, outputs) -> None:
+        if outputs is None:
+            return
+        stage = self.stages[index]
+        nxt = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        if hasattr(outputs, "__aiter__"):
+            async for item in outputs:
+                stage.emitted += 1
+                if nxt:
+                    await nxt.queue.put(item)
+        else:
+            for item in outputs:
+                stage.emitted += 1
+                if nxt:
+                    await nxt.queue.put(item)
+
+    async def _worker(self, index: int) -> None:
+        stage = self.stages[index]
+        while True:
+            item = await stage.queue.get()
+            stage.busy += 1
+            start = time.perf_counter()
+            try:
+                result = stage.handler(item)
+                if not hasattr(result, "__aiter__"):
+                    result = await result
+                await self._emit(index, result)
+                stage.processed += 1
+            except Exception as e:
+                stage.failed += 1
+                metrics.errors.inc(pipeline=self.name, stage=stage.name)
+                logger.error(
+                    f"[{self.name}] [{stage.name}] {self.describe(item)} failed: {e}"
+                )
+                if self.on_error:
+                    self.on_error(item, e)
+            finally:
+                elapsed = time.perf_counter() - start
+                stage.seconds += elapsed
+                metrics.stage_seconds.observe(
+                    elapsed, pipeline=self.name, stage=stage.name
+                )
+                stage.busy -= 1
+                stage.queue.task_done()
+
+    async def run(self, items: Iterable[Any]) -> dict:
+        pipelines[self.name] = self
+        self.started_at = time.time()
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(stage.maxsize)
+        workers = [
+            asyncio.create_task(self._worker(i))
+            for i, stage in enumerate(self.stages)
+            for _ in range(stage.workers)
+        ]
+        try:
+            for item in items:
+                await self.stages[0].queue.put(item)
+            # a stage is drained once every stage before it is
+            for stage in self.stages:
+                await stage.queue.join()
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.finished_at = time.time()
+        return self.stats()
+
+    def stats(self) -> dict:
+        end = self.finished_at or time.time()
+        return {
+            "name": self.name,
+            "running": self.started_at is not None and self.finished_at is None,
+            "seconds": round(end - self.started_at, 2) if self.started_at else 0,
+            "stages": {s.name: s.stats() for s in self.stages},
+        }
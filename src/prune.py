@@ -0,0 +1,119 @@
+import asyncio
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup, Comment
+from markdownify import MarkdownConverter
+
+from src import metrics
+
+# never content
+REMOVE_TAGS = [
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "canvas",
+    "iframe",
+    "object",
+    "video",
+    "audio",
+    "picture",
+    "img",
+    "form",
+    "button",
+    "input",
+    "select",
+    "textarea",
+    "nav",
+    "footer",
+    "aside",
+    "link",
+    "meta",
+]
+# banners, dialogs and ads matched on id/class
+NON_CONTENT = re.compile(
+    r"cookie|consent|gdpr|onetrust|modal|popup|dialog|advert|sponsor|paywall|"
+    r"newsletter-signup|(^|[-_ ])ad([-_ ]|$)",
+    re.I,
+)
+DEFAULT_SELECTORS = ["main", "[role=main]"]
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def prune_html(html: str, selectors: list[str] | None = None) -> BeautifulSoup:
+    """
+    Drop scripts, styles, media, navigation and banner nodes, then keep only
+    the regions matching selectors (the source's, else main) when any match.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for node in soup(REMOVE_TAGS):
+        node.decompose()
+    for comment in soup.find_all(string=lambda s: isinstance(s, Comment)):
+        comment.extract()
+    for node in soup.find_all(attrs={"id": NON_CONTENT}) + soup.find_all(
+        attrs={"class": NON_CONTENT}
+    ):
+        if not node.decomposed and node.name not in ("html", "body", "main"):
+            node.decompose()
+
+    for candidate in (selectors, DEFAULT_SELECTORS):
+        regions = soup.select(", ".join(candidate)) if candidate else []
+        # select returns nested matches too, keep only the outermost ones
+        ids = {id(r) for r in regions}
+        regions = [r for r in regions if not any(id(p) in ids for p in r.parents)]
+        if regions:
+            kept = BeautifulSoup("", "html.parser")
+            for region in regions:
+                kept.append(region.extract())
+            return kept
+    return soup.body or soup
+
+
+def html_to_markdown(html: str, selectors: list[str] | None = None) -> str:
+    # convert the pruned tree directly instead of re-parsing it in markdownify
+    return MarkdownConverter().convert_soup(prune_html(html, selectors))
+
+
+def timed_html_to_markdown(
+    html: str, selectors: list[str] | None = None
+) -> tuple[str, float]:
+    # cpu seconds measured on the worker process, for metrics
+    start = time.process_time()
+    markdown = html_to_markdown(html, selectors)
+    return markdown, time.process_time() - start
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the app process runs threads and an event loop
+        _pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+async def to_markdown(
+    html: str, selectors: list[str] | None = None, workers: int = 2
+) -> str:
+    """
+    Prune and markdownify on a worker process, off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    markdown, cpu = await loop.run_in_executor(
+        get_pool(workers), timed_html_to_markdown, html, selectors
+    )
+    metrics.markdown_cpu_seconds.observe(cpu, source=metrics.current_source.get())
+    return markdown
+
+
+def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
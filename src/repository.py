@@ -0,0 +1,154 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+
+from src import metrics
+from src.config import settings
+
+SBIR_KEY = "SBIRTopicLink"
+
+
+async def _execute(query, table: str, op: str):
+    with metrics.supabase_seconds.time(table=table, op=op):
+        return await query.execute()
+
+
+async def _chunked(
+    rows: list[dict], write: Callable[[list[dict]], Awaitable[list[dict]]]
+) -> list[dict]:
+    """
+    Split a bulk write into SUPABASE_CHUNK-row requests, at most
+    SUPABASE_WRITE_CONCURRENCY in flight, and concatenate what they return.
+    """
+    sem = asyncio.Semaphore(settings.SUPABASE_WRITE_CONCURRENCY)
+    size = settings.SUPABASE_CHUNK
+
+    async def run(chunk: list[dict]) -> list[dict]:
+        async with sem:
+            return await write(chunk)
+
+    results = await asyncio.gather(
+        *[run(rows[i : i + size]) for i in range(0, len(rows), size)]
+    )
+    return [row for chunk in results for row in chunk]
+
+
+async def _paginate(
+    table: str, build_query: Callable, page_size: int | None = None
+) -> AsyncIterator[list[dict]]:
+    """
+    Page through a select with range() so results aren't capped at the
+    server's max rows. build_query must return a fresh, ordered query.
+    """
+    page_size = page_size or settings.SUPABASE_PAGE_SIZE
+    offset = 0
+    while True:
+        query = build_query().range(offset, offset + page_size - 1)
+        rows = (await _execute(query, table, "select")).data
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+class NewsRepository:
+    table = "news"
+
+    async def insert_new(self, articles: list[dict]) -> list[dict]:
+        """
+        Insert articles, ignoring urls already present. Returns only the rows
+        that were actually inserted.
+        """
+
+        async def write(chunk: list[dict]) -> list[dict]:
+            response = await _execute(
+                settings.supabase_client.from_(self.table).upsert(
+                    chunk, ignore_duplicates=True, returning="representation"
+                ),
+                self.table,
+                "upsert",
+            )
+            return response.data
+
+        return await _chunked(articles, write)
+
+    async def iter_urls(self) -> AsyncIterator[list[str]]:
+        async for rows in _paginate(
+            self.table,
+            lambda: settings.supabase_client.from_(self.table)
+            .select("url")
+            .order("url")
+        ):
+            yield [r["url"] for r in rows]
+
+
+class SbirRepository:
+    table = "sbir"
+
+    async def insert(self, rows: list[dict]) -> None:
+        """
+        Insert topics, leaving existing rows (and their summaries) untouched.
+        """
+
+        async def write(chunk: list[dict]) -> list[dict]:
+            await _execute(
+                settings.supabase_client.from_(self.table).upsert(
+                    chunk, ignore_duplicates=True, returning="minimal"
+                ),
+                self.table,
+                "upsert",
+            )
+            return []
+
+        await _chunked(rows, write)
+
+    async def update(self, rows: list[dict]) -> None:
+        """
+        Update existing topics by link, writing only the columns present in
+        each row. One PATCH per row, at most SUPABASE_WRITE_CONCURRENCY in
+        flight; unlike an upsert it never inserts, so links no longer in the
+        table are left alone and other columns' constraints aren't checked.
+        """
+        sem = asyncio.Semaphore(settings.SUPABASE_WRITE_CONCURRENCY)
+
+        async def write(row: dict) -> None:
+            values = {k: v for k, v in row.items() if k != SBIR_KEY}
+            async with sem:
+                await _execute(
+                    settings.supabase_client.from_(self.table)
+                    .update(values, returning="minimal")
+                    .eq(SBIR_KEY, row[SBIR_KEY]),
+                    self.table,
+                    "update",
+                )
+
+        await asyncio.gather(*[write(row) for row in rows])
+
+    async def unsummarized(self, columns: list[str]) -> list[dict]:
+        """
+        All topics without a summary, selecting only the given columns.
+        """
+        # quote identifiers since the csv column names contain spaces
+        select = ",".join(f'"{c}"' for c in columns)
+        rows = []
+        async for page in _paginate(
+            self.table,
+            lambda: settings.supabase_client.from_(self.table)
+            .select(select)
+            .is_("summary", "null")
+            .order(SBIR_KEY)
+        ):
+            rows += page
+        return rows
+
+    async def set_summaries(self, rows: list[dict]) -> None:
+        """
+        Write just the summary column for each topic.
+        """
+        await self.update(
+            [{SBIR_KEY: r[SBIR_KEY], "summary": r["summary"]} for r in rows]
+        )
+
+
+news = NewsRepository()
+sbir = SbirRepository()
@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import random
+import time
+import traceback
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from src import local_store
+from src.bot import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class Run:
+    _ids = itertools.count(1)
+
+    def __init__(self, job_id: str, trigger: str):
+        self.id = next(self._ids)
+        self.job_id = job_id
+        self.trigger = trigger
+        self.status = "running"
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self.error: str | None = None
+        self.result: Any = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "job_id": self.job_id,
+            "trigger": self.trigger,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 2),
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class Job:
+    def __init__(
+        self,
+        id: str,
+        func: Callable[..., Awaitable[Any]],
+        interval: float,
+        jitter: float,
+        history: int,
+    ):
+        self.id = id
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.history: deque[Run] = deque(maxlen=history)
+        self.current: Run | None = None
+        self.task: asyncio.Task | None = None
+        self.next_run_at: float | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def to_dict(self, history: bool = False) -> dict:
+        status = {
+            "id": self.id,
+            "running": self.running,
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "next_run_at": self.next_run_at,
+            "current": self.current.to_dict() if self.running else None,
+            "last": self.history[-1].to_dict() if self.history else None,
+        }
+        if history:
+            status["history"] = [r.to_dict() for r in reversed(self.history)]
+        return status
+
+
+class Scheduler:
+    """
+    Runs each job every `interval` seconds (plus up to `jitter` seconds) and on
+    demand, never more than one run per job at a time. Keeps strong references
+    to every task and a short run history per job. The last scheduled start is
+    stored locally so restarts don't reset the clock.
+    """
+
+    def __init__(self, history: int = 20):
+        self.jobs: dict[str, Job] = {}
+        self.history = history
+        self._loops: list[asyncio.Task] = []
+        self.conn = local_store.connect("scheduler")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS last_run (
+                job_id TEXT PRIMARY KEY,
+                started_at REAL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def add(
+        self,
+        id: str,
+        func: Callable[..., Awaitable[Any]],
+        interval: float,
+        jitter: float = 0,
+    ) -> Job:
+        self.jobs[id] = Job(id, func, interval, jitter, self.history)
+        return self.jobs[id]
+
+    def run_now(
+        self, job_id: str, trigger: str = "manual", **kwargs
+    ) -> tuple[bool, Run]:
+        """
+        Start a run unless one is in flight, passing kwargs to the job.
+        Returns (started, run) where run is the new run or the one already running.
+        """
+        job = self.jobs[job_id]
+        if job.running:
+            return False, job.current
+
+        run = Run(job_id, trigger)
+        job.current = run
+        job.history.append(run)
+        job.task = asyncio.create_task(self._execute(job, run, kwargs))
+        return True, run
+
+    async def _execute(self, job: Job, run: Run, kwargs: dict) -> None:
+        logger.info(f"[SCHEDULER] [{job.id}] Run {run.id} started ({run.trigger})")
+        try:
+            run.result = await job.func(**kwargs)
+            run.status = "success"
+        except asyncio.CancelledError:
+            run.status = "cancelled"
+            raise
+        except Exception as e:
+            run.status = "failed"
+            run.error = "".join(traceback.format_exception_only(e)).strip()
+            logger.error(f"[SCHEDULER] [{job.id}] Run {run.id} failed: {run.error}")
+        finally:
+            run.finished_at = time.time()
+            seconds = round(run.finished_at - run.started_at, 2)
+            logger.info(f"[SCHEDULER] [{job.id}] Run {run.id} {run.status} in {seconds}s")
+
+    async def cancel(self, job_id: str) -> bool:
+        job = self.jobs[job_id]
+        if not job.running:
+            return False
+        job.task.cancel()
+        await asyncio.gather(job.task, return_exceptions=True)
+        return True
+
+    def _last_run(self, job_id: str) -> float | None:
+        row = self.conn.execute(
+            "SELECT started_at FROM last_run WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    async def _loop(self, job: Job) -> None:
+        last = self._last_run(job.id) or time.time()
+        while True:
+            job.next_run_at = last + job.interval + random.uniform(0, job.jitter)
+            await asyncio.sleep(max(0, job.next_run_at - time.time()))
+            last = time.time()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO last_run VALUES (?, ?)", (job.id, last)
+            )
+            self.conn.commit()
+            started, run = self.run_now(job.id, trigger="schedule")
+            if not started:
+                logger.info(
+                    f"[SCHEDULER] [{job.id}] Skipped, run {run.id} still in flight"
+                )
+
+    @property
+    def running(self) -> bool:
+        return any(not loop.done() for loop in self._loops)
+
+    def start(self) -> None:
+        self._loops = [
+            asyncio.create_task(self._loop(job)) for job in self.jobs.values()
+        ]
+
+    async def stop(self) -> None:
+        tasks = self._loops + [j.task for j in self.jobs.values() if j.running]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loops = []
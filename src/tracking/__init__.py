@@ -1,3 +1,15 @@
-from src.tracking.blogs import track_blogs
-from src.tracking.news import track_news
-from src.tracking.sbir import track_sbir
+import importlib
+
+# trackers are imported on first use, so importing src.tracking (and main)
+# doesn't pull in playwright, browserbase, instructor, numpy and markdownify
+_trackers = {
+    "track_blogs": "src.tracking.blogs",
+    "track_news": "src.tracking.news",
+    "track_sbir": "src.tracking.sbir",
+}
+
+
+def __getattr__(name: str):
+    if name in _trackers:
+        return getattr(importlib.import_module(_trackers[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+from src import local_store, repository
+from src.bot import setup_logger
+
+logger = setup_logger(__name__)
+
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "mc_cid",
+    "mc_eid",
+    "igshid",
+    "ref",
+    "ref_src",
+    "cmpid",
+    "guccounter",
+    "guce_referrer",
+    "guce_referrer_sig",
+    "ncid",
+    "sr_share",
+    "taid",
+}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    One spelling per article: https, lowercase host without default port,
+    no fragment, no tracking params, sorted query and no trailing slash.
+    Query pairs are kept as encoded, since re-encoding them (%20 -> +) can
+    make a different url for some origins.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = []
+    for pair in parts.query.split("&"):
+        key = unquote_plus(pair.split("=", 1)[0]).lower()
+        if pair and key not in TRACKING_PARAMS and not key.startswith("utm_"):
+            query.append(pair)
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, "&".join(sorted(query)), ""))
+
+
+def _key(url: str) -> int:
+    # 8 byte hash of the canonical url, stored as a signed sqlite integer
+    digest = hashlib.blake2b(canonicalize_url(url).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class SeenIndex:
+    """
+    On-disk set of article urls already in the news table, so known articles
+    are filtered locally instead of being shipped to the upsert every run.
+    """
+
+    def __init__(self):
+        self.conn = local_store.connect("seen_urls")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen (key INTEGER PRIMARY KEY) WITHOUT ROWID"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self._warm_lock = asyncio.Lock()
+        self._warmed = False
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def __contains__(self, url: str) -> bool:
+        return (
+            self.conn.execute("SELECT 1 FROM seen WHERE key = ?", (_key(url),)).fetchone()
+            is not None
+        )
+
+    def add(self, urls: list[str]) -> None:
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO seen VALUES (?)", [(_key(u),) for u in urls]
+        )
+        self.conn.commit()
+
+    def filter_new(self, articles: list[dict]) -> list[dict]:
+        """
+        Canonicalize urls in place, drop in-batch repeats and known articles.
+        """
+        new, batch = [], set()
+        for a in articles:
+            a["url"] = canonicalize_url(a["url"])
+            if a["url"] in batch:
+                continue
+            batch.add(a["url"])
+            if a["url"] in self:
+                self.hits += 1
+            else:
+                self.misses += 1
+                new.append(a)
+        return new
+
+    async def warm(self) -> bool:
+        """
+        Fill the index from the news table once per process. Returns whether
+        the index is warm.
+        """
+        async with self._warm_lock:
+            if self._warmed:
+                return True
+            try:
+                loaded = 0
+                async for urls in repository.news.iter_urls():
+                    self.add(urls)
+                    loaded += len(urls)
+                self._warmed = True
+                logger.info(f"[DEDUP] Warmed seen-url index with {loaded} urls")
+            except Exception as e:
+                logger.error(f"[DEDUP] Could not warm seen-url index: {e}")
+            return self._warmed
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+seen_index = SeenIndex()
@@ -0,0 +1,123 @@
+import re
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from src.llm import CHARS_PER_TOKEN, estimate_tokens
+
+# [text](url "optional title"); the text can't contain brackets so image-wrapped
+# links like [![alt](img)](url) only match the inner image, which we drop
+MD_LINK = re.compile(r'(!?)\[([^\[\]]*)\]\(\s*<?([^\s)>]+)>?(?:\s+"[^"]*")?\s*\)')
+HTML_ANCHOR = re.compile(r"<a\s[^>]*?href=[\"']([^\"']+)[\"'][^>]*>(.*?)</a>", re.S | re.I)
+TAG = re.compile(r"<[^>]+>")
+MD_FORMATTING = re.compile(r"[*_`#>]+")
+WHITESPACE = re.compile(r"\s+")
+
+# paths that are never articles
+NON_ARTICLE = re.compile(
+    r"/(tag|tags|category|categories|author|authors|topic|topics|page|search|login|"
+    r"signin|subscribe|newsletters?|about|contact|privacy|terms|feed|rss)(/|$)",
+    re.I,
+)
+IMAGE = re.compile(r"\.(png|jpe?g|gif|svg|webp|avif)(\?|$)", re.I)
+MIN_HEADLINE_WORDS = 4
+
+
+def _clean(text: str) -> str:
+    text = TAG.sub(" ", text)
+    text = MD_FORMATTING.sub(" ", text)
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def extract_links(content: str, base_url: str) -> list[dict]:
+    """
+    Pull headline/url pairs out of markdown links and raw html anchors.
+    Relative urls are resolved against base_url, fragments are dropped and
+    each url is kept once with its longest anchor text.
+    """
+    found = [
+        (href, text)
+        for image, text, href in MD_LINK.findall(content)
+        if not image
+    ]
+    found += HTML_ANCHOR.findall(content)
+
+    links: dict[str, str] = {}
+    for href, text in found:
+        url = urldefrag(urljoin(base_url, href.strip()))[0]
+        if urlparse(url).scheme not in ("http", "https"):
+            continue
+        text = _clean(text)
+        if len(text) > len(links.get(url, "")):
+            links[url] = text
+        else:
+            links.setdefault(url, text)
+    return [{"headline": text, "url": url} for url, text in links.items()]
+
+
+def match_pattern(links: list[dict], pattern: str) -> list[dict]:
+    """
+    Links whose url matches the source's article pattern, e.g. r"/\\d{4}/\\d{2}/".
+    """
+    regex = re.compile(pattern)
+    return [l for l in links if l["headline"] and regex.search(l["url"])]
+
+
+def candidate_links(links: list[dict], base_url: str) -> list[dict]:
+    """
+    Drop links that can't be articles: other sites, the homepage itself,
+    images, section/tag/author pages and short navigation labels.
+    """
+    site = urlparse(base_url).netloc.lower().removeprefix("www.")
+    candidates = []
+    for l in links:
+        parsed = urlparse(l["url"])
+        host = parsed.netloc.lower().removeprefix("www.")
+        if not (host == site or host.endswith(f".{site}") or site.endswith(f".{host}")):
+            continue
+        if parsed.path.strip("/") == "" or l["url"].rstrip("/") == base_url.rstrip("/"):
+            continue
+        if IMAGE.search(parsed.path) or NON_ARTICLE.search(parsed.path):
+            continue
+        if len(l["headline"].split()) < MIN_HEADLINE_WORDS:
+            continue
+        candidates.append(l)
+    return candidates
+
+
+def format_candidates(candidates: list[dict]) -> str:
+    return "\n".join(f"{c['headline']} | {c['url']}" for c in candidates)
+
+
+def chunk_content(content: str, chunk_tokens: int, overlap_tokens: int) -> list[str]:
+    """
+    Split content on line boundaries into chunks of at most ~chunk_tokens,
+    each starting with the last ~overlap_tokens of the previous chunk so a
+    headline cut at a boundary is whole in at least one chunk. Lines longer
+    than a chunk are hard-split.
+    """
+    if estimate_tokens(content) <= chunk_tokens:
+        return [content]
+
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    lines = []
+    for line in content.splitlines():
+        pieces = range(0, len(line), max_chars)
+        lines += [line[i : i + max_chars] for i in pieces] or [""]
+
+    chunks, current, size = [], [], 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if current and size + tokens > chunk_tokens:
+            chunks.append("\n".join(current))
+            # carry the tail of this chunk over as overlap
+            overlap, overlap_size = [], 0
+            for prev in reversed(current):
+                overlap_size += estimate_tokens(prev)
+                if overlap_size > overlap_tokens:
+                    break
+                overlap.insert(0, prev)
+            current, size = overlap, sum(estimate_tokens(l) for l in overlap)
+        current.append(line)
+        size += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
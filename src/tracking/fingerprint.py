@@ -0,0 +1,105 @@
+import hashlib
+import re
+import time
+
+import httpx
+
+from src import local_store
+from src.http_client import get_client
+from src.tracking.extract import extract_links
+
+WHITESPACE = re.compile(r"\s+")
+
+
+class FingerprintStore:
+    """
+    Per-source fingerprint of the last successfully processed page: a hash of
+    the normalized content plus the origin's ETag and Last-Modified.
+    """
+
+    def __init__(self):
+        self.conn = local_store.connect("fingerprints")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                url TEXT PRIMARY KEY,
+                hash TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                updated_at REAL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, url: str) -> dict | None:
+        row = self.conn.execute(
+            "SELECT * FROM fingerprints WHERE url = ?", (url,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def save(
+        self,
+        url: str,
+        hash: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?)",
+            (url, hash, etag, last_modified, time.time()),
+        )
+        self.conn.commit()
+
+
+store = FingerprintStore()
+
+
+def content_hash(content: str, base_url: str) -> str:
+    """
+    Hash the set of links on the page so ads, timestamps and reordering don't
+    count as changes. Pages without links fall back to whitespace-normalized text.
+    """
+    links = extract_links(content, base_url)
+    if links:
+        normalized = "\n".join(sorted(f"{l['url']} {l['headline']}" for l in links))
+    else:
+        normalized = WHITESPACE.sub(" ", content).strip().lower()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+async def probe_origin(url: str, fingerprint: dict | None) -> tuple[bool, dict]:
+    """
+    Conditional HEAD against the origin using the stored validators.
+    Returns (unchanged, validators); any error means "unknown", i.e. changed.
+    """
+    headers = {}
+    if fingerprint and fingerprint["etag"]:
+        headers["If-None-Match"] = fingerprint["etag"]
+    if fingerprint and fingerprint["last_modified"]:
+        headers["If-Modified-Since"] = fingerprint["last_modified"]
+
+    try:
+        response = await get_client().head(url, headers=headers, timeout=10)
+    except httpx.HTTPError:
+        return False, {}
+
+    validators = {
+        "etag": response.headers.get("etag"),
+        "last_modified": response.headers.get("last-modified"),
+    }
+    if response.status_code == 304:
+        return True, {
+            "etag": validators["etag"] or fingerprint["etag"],
+            "last_modified": validators["last_modified"]
+            or fingerprint["last_modified"],
+        }
+    if not response.is_success:
+        return False, {}
+
+    unchanged = bool(
+        fingerprint
+        and validators["etag"]
+        and validators["etag"] == fingerprint["etag"]
+    )
+    return unchanged, validators
@@ -0,0 +1,92 @@
+import time
+from collections import defaultdict
+
+from src.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures. Once `cooldown` seconds have
+    passed a single half-open probe is let through: success closes the
+    breaker, failure opens it again.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.last_error: str | None = None
+        self.last_success: float | None = None
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.time() >= self.opened_at + self.cooldown:
+            self.state = HALF_OPEN
+            return True
+        # open and cooling down, or a half-open probe is already in flight
+        return False
+
+    def success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_success = time.time()
+
+    def failure(self, error: BaseException | str) -> None:
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            self.state = OPEN
+            self.opened_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened_at": self.opened_at,
+            "retry_at": self.opened_at + self.cooldown if self.opened_at else None,
+            "last_error": self.last_error,
+            "last_success": self.last_success,
+        }
+
+
+class HealthTracker:
+    """
+    One circuit breaker per (source url, fetch strategy).
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.breakers: dict[str, dict[str, CircuitBreaker]] = defaultdict(dict)
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+    def breaker(self, url: str, strategy: str) -> CircuitBreaker:
+        if strategy not in self.breakers[url]:
+            self.breakers[url][strategy] = CircuitBreaker(self.threshold, self.cooldown)
+        return self.breakers[url][strategy]
+
+    def available(self, url: str, strategies: list[str]) -> bool:
+        """
+        Whether any strategy could be tried now, without changing breaker state.
+        """
+        now = time.time()
+        return any(
+            b.state == CLOSED
+            or (b.state == OPEN and now >= b.opened_at + b.cooldown)
+            for b in (self.breaker(url, s) for s in strategies)
+        )
+
+    def status(self, url: str) -> dict:
+        return {name: b.to_dict() for name, b in self.breakers.get(url, {}).items()}
+
+
+health = HealthTracker(
+    threshold=settings.BREAKER_FAILURE_THRESHOLD, cooldown=settings.BREAKER_COOLDOWN
+)
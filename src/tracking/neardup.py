@@ -0,0 +1,233 @@
+import time
+
+import numpy as np
+
+from src import llm, local_store
+from src.bot import setup_logger
+from src.config import settings
+
+logger = setup_logger(__name__)
+
+
+class NearDupIndex:
+    """
+    Rolling index of recent headline embeddings, so the same story picked up
+    by several sources in a channel is only posted once: later copies from
+    other sources are dropped and the first post stands. Headlines are never
+    matched against their own source, whose exact repeats the seen-url index
+    already catches. Unit vectors live in a float32 memmap under
+    LOCAL_STORE_DIR, one row per headline, with the row metadata in sqlite.
+    A batch of headlines is checked against the whole window with one matrix
+    product; rows older than the window are dropped when the file fills up.
+    """
+
+    def __init__(
+        self,
+        name: str = "near_dup",
+        dim: int = settings.EMBEDDING_DIMENSIONS,
+        threshold: float = settings.NEAR_DUP_THRESHOLD,
+        window_days: float = settings.NEAR_DUP_WINDOW_DAYS,
+    ):
+        self.dim = dim
+        self.threshold = threshold
+        self.window = window_days * 86400
+        self.path = local_store.path(f"{name}.f32")
+        self.dropped = 0
+        self.checked = 0
+        self.conn = local_store.connect(name)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS headlines (
+                row INTEGER PRIMARY KEY,
+                channel_id INTEGER,
+                url TEXT,
+                headline TEXT,
+                created_at REAL,
+                duplicate_of TEXT,
+                source TEXT
+            )
+            """
+        )
+        columns = [r[1] for r in self.conn.execute("PRAGMA table_info(headlines)")]
+        if "source" not in columns:
+            # indexes written before rows kept their source match any source
+            self.conn.execute("ALTER TABLE headlines ADD COLUMN source TEXT")
+        self.conn.commit()
+
+        rows = self.conn.execute(
+            "SELECT channel_id, created_at, source FROM headlines ORDER BY row"
+        ).fetchall()
+        self.size = len(rows)
+        capacity = self.path.stat().st_size // (4 * dim) if self.path.exists() else 0
+        if capacity < self.size:
+            # vectors missing or written with another dimension, start over
+            logger.info(f"[NEAR-DUP] Index file doesn't match {self.size} rows, resetting")
+            self.conn.execute("DELETE FROM headlines")
+            self.conn.commit()
+            self.path.unlink(missing_ok=True)
+            rows, self.size, capacity = [], 0, 0
+        self.channels = np.array([r[0] for r in rows], dtype=np.int64)
+        self.created = np.array([r[1] for r in rows], dtype=np.float64)
+        self.sources = np.array([r[2] for r in rows], dtype=object)
+        self.vectors = self._open(max(capacity, 1024))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _open(self, capacity: int) -> np.memmap:
+        with open(self.path, "ab") as f:
+            f.truncate(max(capacity * self.dim * 4, f.tell()))
+        self.capacity = capacity
+        return np.memmap(
+            self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def _reserve(self, n: int) -> None:
+        if self.size + n <= self.capacity:
+            return
+        self.compact()
+        if self.size + n > self.capacity:
+            self.vectors.flush()
+            capacity = max(self.capacity * 2, self.size + n)
+            del self.vectors
+            self.vectors = self._open(capacity)
+
+    def compact(self) -> None:
+        """
+        Drop rows older than the window, moving the rest to the front.
+        """
+        keep = self.created >= time.time() - self.window
+        if keep.all():
+            return
+        kept = int(keep.sum())
+        self.vectors[:kept] = self.vectors[: self.size][keep]
+        self.vectors.flush()
+        self.channels, self.created = self.channels[keep], self.created[keep]
+        self.sources = self.sources[keep]
+
+        rows = self.conn.execute(
+            "SELECT channel_id, url, headline, created_at, duplicate_of, source "
+            "FROM headlines ORDER BY row"
+        ).fetchall()
+        self.conn.execute("DELETE FROM headlines")
+        self.conn.executemany(
+            "INSERT INTO headlines VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(i, *r) for i, r in enumerate(r for r, k in zip(rows, keep) if k)],
+        )
+        self.conn.commit()
+        logger.info(f"[NEAR-DUP] Compacted index from {self.size} to {kept} rows")
+        self.size = kept
+
+    def query(
+        self, vectors: np.ndarray, channel_id: int, source: str
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Best cosine similarity and its row for each of the (unit) vectors,
+        against other sources' headlines in this channel within the window;
+        -1 if none.
+        """
+        if self.size == 0:
+            return np.full(len(vectors), -1.0), np.full(len(vectors), -1)
+        sims = vectors @ self.vectors[: self.size].T
+        outside = (
+            (self.channels != channel_id)
+            | (self.sources == source)
+            | (self.created < time.time() - self.window)
+        )
+        sims[:, outside] = -1.0
+        best = sims.argmax(axis=1)
+        return sims[np.arange(len(vectors)), best], best
+
+    def add(
+        self,
+        vectors: np.ndarray,
+        channel_id: int,
+        source: str,
+        articles: list[dict],
+        duplicate_of: list[str | None],
+    ) -> None:
+        self._reserve(len(vectors))
+        now = time.time()
+        start, end = self.size, self.size + len(vectors)
+        self.vectors[start:end] = vectors
+        self.vectors.flush()
+        self.conn.executemany(
+            "INSERT INTO headlines VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (start + i, channel_id, a["url"], a["headline"], now, dup, source)
+                for i, (a, dup) in enumerate(zip(articles, duplicate_of))
+            ],
+        )
+        self.conn.commit()
+        self.channels = np.concatenate(
+            [self.channels, np.full(len(vectors), channel_id, dtype=np.int64)]
+        )
+        self.created = np.concatenate([self.created, np.full(len(vectors), now)])
+        self.sources = np.concatenate(
+            [self.sources, np.full(len(vectors), source, dtype=object)]
+        )
+        self.size = end
+
+    def row(self, row: int) -> dict:
+        return dict(
+            self.conn.execute(
+                "SELECT url, headline FROM headlines WHERE row = ?", (row,)
+            ).fetchone()
+        )
+
+    async def embed(self, headlines: list[str]) -> np.ndarray:
+        vectors = np.asarray(
+            await llm.embed(
+                headlines, settings.EMBEDDING_MODEL, dimensions=self.dim
+            ),
+            dtype=np.float32,
+        )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    async def filter_new(
+        self, articles: list[dict], channel_id: int, source: str
+    ) -> list[dict]:
+        """
+        Drop articles whose headline is a near-duplicate of one another source
+        posted to the channel in the window; the earlier post is left as is.
+        Every headline joins the index.
+        """
+        if not articles:
+            return []
+        try:
+            vectors = await self.embed([a["headline"] for a in articles])
+        except Exception as e:
+            # post everything rather than lose articles
+            logger.error(f"[NEAR-DUP] Could not embed {len(articles)} headlines: {e}")
+            return articles
+
+        # no awaits from here on, so concurrent batches can't miss each other
+        sims, rows = self.query(vectors, channel_id, source)
+        new, duplicate_of = [], []
+        for i, a in enumerate(articles):
+            self.checked += 1
+            if sims[i] < self.threshold:
+                new.append(a)
+                duplicate_of.append(None)
+                continue
+            original = self.row(int(rows[i]))
+            self.dropped += 1
+            duplicate_of.append(original["url"])
+            logger.info(
+                f"[NEAR-DUP] [{a['url']}] \"{a['headline']}\" dropped, duplicate of "
+                f"\"{original['headline']}\" ({original['url']})"
+            )
+        self.add(vectors, channel_id, source, articles, duplicate_of)
+        return new
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "capacity": self.capacity,
+            "checked": self.checked,
+            "dropped": self.dropped,
+        }
+
+
+near_dups = NearDupIndex()
@@ -1,71 +1,28 @@
 import asyncio
-from typing import List
+import time
+from typing import AsyncIterator, List
 
-import requests
-from markdownify import markdownify as md
 from pydantic import BaseModel, Field
 
-from src.bb import bb_get_html
-from src.bot import send_msg, setup_logger
+from src import http_client, llm, metrics, prune, repository
+from src.bb import bb_get_html, session_pool
+from src.bot import setup_logger
 from src.config import settings
-
-channels = {
-    "defense": 1314477322178531338,
-    "business": 1314490175375806505,
-    "world": 1314491244428398622,
-}
-
-base_urls = [
-    {
-        "title": "Defense News",
-        "url": "https://www.defensenews.com/",
-        "category": "defense",
-        "jina": True,
-    },
-    {
-        "title": "TechCrunch",
-        "url": "https://techcrunch.com",
-        "category": "business",
-        "jina": True,
-    },
-    {
-        "title": "Reuters",
-        "url": "https://www.reuters.com/business/aerospace-defense/",
-        "category": "defense",
-        "jina": False,
-        "proxy": True,
-    },
-    {
-        "title": "Financial Times",
-        "url": "https://www.ft.com/companies",
-        "category": "business",
-        "jina": False,
-        "proxy": True,
-    },
-    {
-        "title": "Financial Times",
-        "url": "https://www.ft.com/world",
-        "category": "world",
-        "jina": False,
-        "proxy": True,
-    },
-    {
-        "title": "Eric Berger",
-        "url": "https://arstechnica.com/author/ericberger/",
-        "category": "defense",
-        "jina": True,
-    },
-    # WSJ blocks browserbase
-    # {
-    #     "title": "WSJ",
-    #     "url": "https://www.wsj.com/business",
-    #     "category": "business",
-    #     "jina": False,
-    #     "proxy": True,
-    #     "captcha": True,
-    # },
-]
-
+from src.outbox import Post, outbox
+from src.pipeline import Pipeline, Stage, batched
+from src.tracking import fingerprint
+from src.tracking.dedup import canonicalize_url, seen_index
+from src.tracking.extract import (
+    candidate_links,
+    chunk_content,
+    extract_links,
+    format_candidates,
+    match_pattern,
+)
+from src.tracking.health import HALF_OPEN, health
+from src.tracking.neardup import near_dups
+from src.tracking.runner import HostLimiter
+from src.tracking.sources import Source, registry
 
 logger = setup_logger(__name__)
 
@@ -81,59 +38,460 @@ class Articles(BaseModel):
     articles: List[Article] = Field(description="List of articles on the page")
 
 
-def use_jina(url: str):
+async def use_jina(url: str) -> str:
     headers = {"Authorization": f"Bearer {settings.JINA_API_KEY}", "X-No-Cache": "true"}
-    response = requests.get(f"https://r.jina.ai/{url}", headers=headers)
+    response = await http_client.get(f"https://r.jina.ai/{url}", headers=headers)
     return response.text
 
 
-async def scrape(url: str, jina: bool, proxy: bool = False, captcha: bool = False):
-    if jina:
-        content = use_jina(url)
-    else:
-        html = await asyncio.to_thread(bb_get_html, url, proxy=proxy, captcha=captcha)
-        content = md(html)
-
+def extract_prompt(content: str) -> list[dict]:
     prompt = f"You are given content from a news websites main page, please retrieve all the articles and their URLs. Again, the user is only interested in reading articles, not any other content on the page. Here is the content: {content}"
-    articles = await settings.async_openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        response_model=Articles,
-        messages=[{"role": "user", "content": prompt}],
+    return [{"role": "user", "content": prompt}]
+
+
+async def llm_extract_chunk(content: str) -> list[dict]:
+    articles = await llm.complete(
+        response_model=Articles, messages=extract_prompt(content)
+    )
+    return [x.model_dump() for x in articles.articles]
+
+
+async def llm_stream_chunk(content: str) -> AsyncIterator[dict]:
+    async for article in llm.stream(Article, messages=extract_prompt(content)):
+        yield article.model_dump()
+
+
+def llm_chunks(url: str, content: str, max_tokens: int | None = None) -> list[str]:
+    """
+    Keep content within the source's token cap and split it into overlapping
+    chunks for extraction.
+    """
+    max_tokens = max_tokens or settings.EXTRACT_MAX_TOKENS
+    if (tokens := llm.estimate_tokens(content)) > max_tokens:
+        logger.info(f"[EXTRACT] [{url}] Truncating ~{tokens} tokens to {max_tokens}")
+        content = content[: max_tokens * llm.CHARS_PER_TOKEN]
+
+    chunks = chunk_content(
+        content, settings.EXTRACT_CHUNK_TOKENS, settings.EXTRACT_CHUNK_OVERLAP
     )
-    articles = [x.model_dump() for x in articles.articles]
-    non_duplicates = (
-        settings.supabase_client.table("news")
-        .upsert(
-            articles,
-            ignore_duplicates=True,
-            returning="representation",
-            count="exact",
+    if len(chunks) > 1:
+        logger.info(f"[EXTRACT] [{url}] Extracting from {len(chunks)} chunks")
+    return chunks
+
+
+async def llm_extract(
+    url: str, content: str, max_tokens: int | None = None
+) -> list[dict]:
+    """
+    Extract from all chunks concurrently and merge the results.
+    """
+    chunks = llm_chunks(url, content, max_tokens)
+    if len(chunks) == 1:
+        return await llm_extract_chunk(chunks[0])
+
+    results = await asyncio.gather(
+        *[llm_extract_chunk(chunk) for chunk in chunks], return_exceptions=True
+    )
+    failed = [r for r in results if isinstance(r, Exception)]
+    if len(failed) == len(results):
+        raise failed[0]
+    if failed:
+        logger.error(
+            f"[EXTRACT] [{url}] {len(failed)}/{len(chunks)} chunks failed: {failed[0]}"
         )
-        .execute()
+
+    # overlapping chunks repeat articles, keep the first of each url
+    merged = {}
+    for articles in results:
+        if isinstance(articles, Exception):
+            continue
+        for a in articles:
+            merged.setdefault(canonicalize_url(a["url"]), a)
+    return list(merged.values())
+
+
+async def llm_stream(
+    url: str, content: str, max_tokens: int | None = None
+) -> AsyncIterator[dict]:
+    """
+    Stream articles from all chunks concurrently, each one as soon as the LLM
+    has generated it, skipping urls an overlapping chunk already yielded.
+    """
+    chunks = llm_chunks(url, content, max_tokens)
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def produce(chunk: str) -> None:
+        try:
+            async for article in llm_stream_chunk(chunk):
+                await queue.put(article)
+        finally:
+            await queue.put(done)
+
+    tasks = [asyncio.create_task(produce(chunk)) for chunk in chunks]
+    yielded = set()
+    try:
+        for _ in tasks:
+            while (article := await queue.get()) is not done:
+                if (key := canonicalize_url(article["url"])) not in yielded:
+                    yielded.add(key)
+                    yield article
+    finally:
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    failed = [r for r in results if isinstance(r, Exception)]
+    if len(failed) == len(results) and not yielded:
+        raise failed[0]
+    if failed:
+        logger.error(
+            f"[EXTRACT] [{url}] {len(failed)}/{len(chunks)} chunks failed: {failed[0]}"
+        )
+
+
+def extraction_input(
+    url: str, content: str, pattern: str | None = None
+) -> tuple[list[dict] | None, str]:
+    """
+    Parse links locally first. A source with a url pattern needs no LLM call
+    (the matched articles are returned); otherwise the LLM only sees the
+    compact candidate list, and the full page only if no candidates were found.
+    """
+    links = extract_links(content, url)
+    if pattern and (articles := match_pattern(links, pattern)):
+        logger.info(f"[EXTRACT] [{url}] {len(articles)} articles by pattern, no LLM")
+        return articles, ""
+
+    candidates = candidate_links(links, url)
+    if not candidates:
+        logger.info(f"[EXTRACT] [{url}] No candidate links, sending full page")
+        return None, content
+
+    compact = format_candidates(candidates)
+    logger.info(
+        f"[EXTRACT] [{url}] Sending {len(candidates)} candidates "
+        f"({len(compact)} of {len(content)} chars) to LLM"
     )
-    return non_duplicates
+    return None, f"one candidate link per line as `headline | url`:\n{compact}"
+
+
+async def extract_articles(
+    url: str, content: str, pattern: str | None = None, max_tokens: int | None = None
+) -> list[dict]:
+    articles, llm_content = extraction_input(url, content, pattern)
+    if articles is not None:
+        return articles
+    return await llm_extract(url, llm_content, max_tokens)
+
 
+async def stream_articles(
+    url: str, content: str, pattern: str | None = None, max_tokens: int | None = None
+) -> AsyncIterator[dict]:
+    articles, llm_content = extraction_input(url, content, pattern)
+    if articles is not None:
+        for article in articles:
+            yield article
+        return
+    async for article in llm_stream(url, llm_content, max_tokens):
+        yield article
 
-async def track_news() -> list[dict]:
-    for base_url in base_urls:
+
+async def use_browserbase(source: Source, proxy: bool) -> str:
+    html = await bb_get_html(
+        source.url,
+        proxy=proxy,
+        captcha=source.captcha,
+        load_extension=source.load_extension,
+    )
+    content = await prune.to_markdown(html, source.selectors, settings.HTML_WORKERS)
+    logger.info(
+        f"[PRUNE] [{source.url}] {len(html)} chars of html -> "
+        f"{len(content)} of markdown"
+    )
+    return content
+
+
+fetchers = {
+    "jina": lambda source: use_jina(source.url),
+    "browserbase": lambda source: use_browserbase(source, proxy=False),
+    "browserbase_proxy": lambda source: use_browserbase(source, proxy=True),
+}
+
+
+async def fetch(source: Source) -> str:
+    """
+    Walk the source's strategy chain, skipping strategies whose breaker is
+    open and giving each attempt FETCH_TIMEOUT seconds.
+    """
+    errors = []
+    for strategy in source.strategies:
+        breaker = health.breaker(source.url, strategy)
+        if not breaker.allow():
+            errors.append(f"{strategy}: circuit {breaker.state}")
+            continue
+        start = time.perf_counter()
         try:
-            url = base_url["url"]
-            jina = base_url["jina"]
-            title = base_url["title"]
-            proxy = base_url.get("proxy", False)
-            captcha = base_url.get("captcha", False)
-            channel_id = channels[base_url["category"]]
-            logger.info(f"[NEWS] [{url}] Scraping")
-
-            non_duplicates = await scrape(url, jina, proxy, captcha)
-
-            for a in non_duplicates.data:
-                await send_msg(
-                    channel_id,
-                    f"[{title}] [{a['headline']}]({a['url']})",
-                )
-            logger.info(
-                f"[NEWS] [{url}] Scraped {len(non_duplicates.data)} new articles"
+            content = await asyncio.wait_for(
+                fetchers[strategy](source), settings.FETCH_TIMEOUT
             )
         except Exception as e:
-            logger.error(f"[NEWS] [{url}] Error scraping: {e}")
+            metrics.fetch_seconds.observe(
+                time.perf_counter() - start,
+                source=source.url,
+                strategy=strategy,
+                result="error",
+            )
+            breaker.failure(e)
+            errors.append(f"{strategy}: {type(e).__name__} {e}")
+            logger.info(
+                f"[FETCH] [{source.url}] {strategy} failed, breaker {breaker.state}"
+            )
+            continue
+        except BaseException as e:
+            # cancelled (source timeout, job cancel): a half-open probe that
+            # never reports back would keep the breaker shut until restart
+            if breaker.state == HALF_OPEN:
+                breaker.failure(e)
+            raise
+        metrics.fetch_seconds.observe(
+            time.perf_counter() - start, source=source.url, strategy=strategy, result="ok"
+        )
+        breaker.success()
+        return content
+    raise Exception(f"All fetch strategies failed: {'; '.join(errors)}")
+
+
+async def fetch_stage(source: Source, host_limit: HostLimiter) -> list[dict]:
+    """
+    Fetch one source, or nothing when the origin or the page fingerprint says
+    it hasn't changed since the last run.
+    """
+    url = source.url
+    metrics.current_source.set(url)
+    async with host_limit(url):
+        fp = fingerprint.store.get(url)
+        unchanged, validators = await fingerprint.probe_origin(url, fp)
+        if unchanged:
+            logger.info(f"[FINGERPRINT] [{url}] Not modified at origin, skipping")
+            registry.record(source, 0)
+            return []
+
+        content = await asyncio.wait_for(
+            fetch(source), settings.TRACKING_SOURCE_TIMEOUT
+        )
+
+    page_hash = fingerprint.content_hash(content, url)
+    if fp and fp["hash"] == page_hash:
+        logger.info(f"[FINGERPRINT] [{url}] Content unchanged, skipping")
+        # the stored validators still describe this content; keep them when the
+        # probe failed or the origin sent none, or conditional probes stop working
+        fingerprint.store.save(
+            url,
+            page_hash,
+            etag=validators.get("etag") or fp["etag"],
+            last_modified=validators.get("last_modified") or fp["last_modified"],
+        )
+        registry.record(source, 0)
+        return []
+
+    return [
+        {
+            "source": source,
+            "content": content,
+            "hash": page_hash,
+            "validators": validators,
+        }
+    ]
+
+
+def finish_page(page: dict) -> None:
+    """
+    Remember the page and adapt its poll interval, but only once extraction
+    is over and every article it yielded is safely in the db.
+    """
+    if not page["extracted"] or page["pending"]:
+        return
+    source = page["source"]
+    fingerprint.store.save(source.url, page["hash"], **page["validators"])
+    interval = registry.record(source, page["new"])
+    logger.info(
+        f"[{source.tracker.upper()}] [{source.url}] Scraped {page['new']} new "
+        f"articles, next poll in {interval:.1f}h"
+    )
+
+
+async def extract_stage(page: dict) -> AsyncIterator[dict]:
+    """
+    Pass the page's unseen articles on to persist. When streaming, they go in
+    small batches as the LLM generates them (a batch waits at most
+    EXTRACT_STREAM_LINGER for more), otherwise all together once the whole
+    response is in.
+    """
+    source = page["source"]
+    metrics.current_source.set(source.url)
+    content = page.pop("content")
+    page.update(pending=0, new=0, extracted=False)
+    args = (source.url, content, source.pattern, source.max_tokens)
+
+    if settings.EXTRACT_STREAMING:
+        # the timeout covers time spent waiting on the LLM, not on later stages
+        budget = settings.EXTRACT_TIMEOUT
+        batches = batched(
+            stream_articles(*args),
+            settings.EXTRACT_STREAM_BATCH,
+            settings.EXTRACT_STREAM_LINGER,
+        )
+        try:
+            while True:
+                start = time.monotonic()
+                try:
+                    articles = await asyncio.wait_for(anext(batches), budget)
+                except StopAsyncIteration:
+                    break
+                budget -= time.monotonic() - start
+                new = seen_index.filter_new(articles)
+                metrics.articles.inc(
+                    len(articles) - len(new), source=source.url, result="seen"
+                )
+                if new:
+                    page["pending"] += 1
+                    yield {"page": page, "articles": new}
+        finally:
+            await batches.aclose()
+    else:
+        articles = await asyncio.wait_for(
+            extract_articles(*args), settings.EXTRACT_TIMEOUT
+        )
+        new = seen_index.filter_new(articles)
+        metrics.articles.inc(len(articles) - len(new), source=source.url, result="seen")
+        if new:
+            page["pending"] += 1
+            yield {"page": page, "articles": new}
+
+    page["extracted"] = True
+    finish_page(page)
+
+
+async def persist_stage(item: dict) -> list[Post]:
+    """
+    Insert unseen articles and record their posts in the outbox before
+    anything is sent, so they survive a restart.
+    """
+    page, articles = item["page"], item["articles"]
+    source = page["source"]
+    metrics.current_source.set(source.url)
+    new_articles = await asyncio.wait_for(
+        repository.news.insert_new(articles), settings.PERSIST_TIMEOUT
+    )
+    # everything sent is in the db now, inserted or already there
+    seen_index.add([a["url"] for a in articles])
+    # record the posts right away: the near-duplicate check below can wait on
+    # embeddings for a while, and a crash then mustn't lose inserted rows
+    posts = outbox.add(
+        [
+            (
+                source.channel_id,
+                "msg",
+                {"message": f"[{source.title}] [{a['headline']}]({a['url']})"},
+            )
+            for a in new_articles
+        ]
+    )
+
+    # the same story already posted by another source is dropped
+    unique = new_articles
+    if settings.NEAR_DUP_ENABLED:
+        unique = await near_dups.filter_new(
+            new_articles, source.channel_id, source.url
+        )
+        keep = {id(a) for a in unique}
+        dropped = [p for a, p in zip(new_articles, posts) if id(a) not in keep]
+        outbox.discard([p[0] for p in dropped])
+        posts = [p for a, p in zip(new_articles, posts) if id(a) in keep]
+    for result, count in [
+        ("new", len(unique)),
+        ("existing", len(articles) - len(new_articles)),
+        ("near_duplicate", len(new_articles) - len(unique)),
+    ]:
+        metrics.articles.inc(count, source=source.url, result=result)
+
+    page["new"] += len(new_articles)
+    page["pending"] -= 1
+    finish_page(page)
+    return posts
+
+
+async def notify_stage(post: Post) -> None:
+    outbox.send(post)
+
+
+def describe(item) -> str:
+    if isinstance(item, Source):
+        return item.url
+    if isinstance(item, dict):
+        return item.get("page", item)["source"].url
+    return f"post {item[0]}"
+
+
+async def track_sources(tracker: str, tag: str, force: bool = False) -> dict:
+    """
+    Run the tracker's sources that are due (all of them if force) through
+    fetch -> extract -> persist -> notify, each stage with its own workers.
+    """
+    due = []
+    for source in registry.due(tracker, force):
+        if health.available(source.url, source.strategies):
+            due.append(source)
+        else:
+            logger.info(f"[{tag}] [{source.url}] Skipped, all circuit breakers open")
+    if not due:
+        logger.info(f"[{tag}] No sources due")
+        return {"sources": 0}
+
+    if not await seen_index.warm():
+        # the news table may still hold urls in another spelling than the
+        # canonical ones, so a cold index would let them be posted again
+        raise Exception("Seen-url index could not be warmed, skipping run")
+    host_limit = HostLimiter(settings.TRACKING_HOST_CONCURRENCY)
+    pipeline = Pipeline(
+        tracker,
+        [
+            Stage(
+                "fetch",
+                lambda source: fetch_stage(source, host_limit),
+                workers=settings.TRACKING_CONCURRENCY,
+            ),
+            Stage(
+                "extract", extract_stage, workers=settings.PIPELINE_EXTRACT_WORKERS
+            ),
+            Stage(
+                "persist", persist_stage, workers=settings.PIPELINE_PERSIST_WORKERS
+            ),
+            Stage("notify", notify_stage, maxsize=1000),
+        ],
+        describe=describe,
+    )
+    try:
+        stats = await pipeline.run(due)
+    finally:
+        logger.info(f"[{tag}] Seen-url index: {seen_index.stats()}")
+        logger.info(f"[{tag}] Near-duplicate index: {near_dups.stats()}")
+        logger.info(f"[{tag}] Browserbase sessions: {session_pool.stats()}")
+        await session_pool.drain()
+
+    stages = stats["stages"]
+    logger.info(
+        f"[{tag}] Run finished in {stats['seconds']}s: {len(due)} sources, "
+        f"{stages['fetch']['failed']} fetch / {stages['extract']['failed']} extract / "
+        f"{stages['persist']['failed']} persist failures, "
+        f"{stages['persist']['emitted']} new articles"
+    )
+    logger.info(f"[{tag}] Client usage: {settings.clients.stats()}")
+    logger.info(f"[{tag}] LLM limiter: {llm.limiter.stats()}")
+    logger.info(f"[{tag}] LLM cache: {llm.cache.stats()}")
+    return stats
+
+
+async def track_news(force: bool = False) -> dict:
+    return await track_sources("news", "NEWS", force)
@@ -0,0 +1,20 @@
+import asyncio
+from collections import defaultdict
+from urllib.parse import urlparse
+
+
+class HostLimiter:
+    """
+    Hands out one semaphore per host so sources sharing a host
+    (ft.com/companies and ft.com/world) never hit it at the same time.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphores: dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(self.limit)
+        )
+
+    def __call__(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower().removeprefix("www.")
+        return self.semaphores[host]
@@ -1,24 +1,153 @@
 import asyncio
+import csv
+import hashlib
+import json
+from datetime import date, timedelta
+from typing import AsyncIterator, List
 
-import pandas as pd
-import requests
 from pydantic import BaseModel, Field
-from tqdm.asyncio import tqdm
 
-from src.bot import send_embed, setup_logger
+from src import http_client, llm, local_store, metrics, repository
+from src.bot import setup_logger
 from src.config import settings
+from src.outbox import Post, outbox
+from src.pipeline import Pipeline, Stage
 
 logger = setup_logger(__name__)
 # tracking>sbir-grants
 CHANNEL_ID = 1314432734697095238
 url = "https://www.sbir.gov/topics"
+KEY = repository.SBIR_KEY
+DATE_FORMAT = "%Y-%m-%d"
 
 
 class Summary(BaseModel):
     summary: str = Field(description="Summary of the topic")
 
 
-def load_sbir_from_website():
+class TopicSummary(BaseModel):
+    link: str = Field(description="The Topic Link of the topic, copied exactly")
+    summary: str = Field(description="Summary of the topic")
+
+
+class TopicSummaries(BaseModel):
+    summaries: List[TopicSummary] = Field(
+        description="One summary per topic, in the order given"
+    )
+
+
+class SbirIndex:
+    """
+    Local record of every topic row sent to the sbir table (link -> row hash)
+    plus the watermarks used to shrink the next download.
+    """
+
+    def __init__(self):
+        self.conn = local_store.connect("sbir")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS topics (link TEXT PRIMARY KEY, hash TEXT);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self.conn.commit()
+
+    def hashes(self, links: list[str]) -> dict[str, str]:
+        found = {}
+        # stay under sqlite's bound parameter limit
+        for i in range(0, len(links), 500):
+            chunk = links[i : i + 500]
+            found.update(
+                self.conn.execute(
+                    f"SELECT link, hash FROM topics WHERE link IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+            )
+        return found
+
+    def save(self, rows: list[dict]) -> None:
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO topics VALUES (?, ?)",
+            [(r[KEY], row_hash(r)) for r in rows],
+        )
+        self.conn.commit()
+
+    def get_meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+        self.conn.commit()
+
+
+index = SbirIndex()
+
+
+def row_hash(row: dict) -> str:
+    return hashlib.sha1(json.dumps(row, sort_keys=True).encode()).hexdigest()
+
+
+async def iter_lines(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Split streamed text on "\n" only, keeping the newline. httpx's
+    aiter_lines() also breaks on \r, \x0b, \x0c, \u2028 and friends, which
+    turns one record with such a character in an unquoted field into two.
+    """
+    buffer = ""
+    async for chunk in chunks:
+        *lines, buffer = (buffer + chunk).split("\n")
+        for line in lines:
+            yield f"{line}\n"
+    if buffer:
+        yield buffer
+
+
+async def iter_csv_rows(chunks: AsyncIterator[str]) -> AsyncIterator[dict]:
+    """
+    Parse CSV rows as text arrives. A record is complete once its quotes are
+    balanced, so quoted fields spanning several lines are reassembled first
+    and their line breaks kept as sent. Empty fields become None.
+    """
+    header = None
+    record = None
+    async for line in iter_lines(chunks):
+        record = line if record is None else record + line
+        if record.count('"') % 2:
+            continue
+        values, record = next(csv.reader([record]), []), None
+        if not values:
+            continue
+        if header is None:
+            # the export may start with a UTF-8 BOM, which pandas used to strip
+            header = values
+            header[0] = header[0].lstrip("\ufeff")
+            continue
+        yield {k: (v if v != "" else None) for k, v in zip(header, values)}
+
+
+def next_open_date_from() -> tuple[str, bool]:
+    """
+    Returns (open_date_from, full) for the next download: empty and full when
+    there is no watermark or the last full download is too old.
+    """
+    watermark = index.get_meta("watermark")
+    last_full = index.get_meta("last_full")
+    today = date.today()
+    if (
+        not watermark
+        or not last_full
+        or date.fromisoformat(last_full)
+        <= today - timedelta(days=settings.SBIR_FULL_REFRESH_DAYS)
+    ):
+        return "", True
+    since = date.fromisoformat(watermark) - timedelta(
+        days=settings.SBIR_WATERMARK_OVERLAP_DAYS
+    )
+    return since.strftime(DATE_FORMAT), False
+
+
+async def load_sbir_from_website(open_date_from: str = "") -> AsyncIterator[dict]:
     headers = {
         "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
         "accept-language": "en-GB,en-US;q=0.9,en;q=0.8",
@@ -38,7 +167,7 @@ def load_sbir_from_website():
     }
     data = {
         "keywords": "",
-        "open_date_from": "",
+        "open_date_from": open_date_from,
         "open_date_to": "",
         "close_date_from": "",
         "close_date_to": "",
@@ -48,80 +177,226 @@ def load_sbir_from_website():
         "form_id": "topics_search",
     }
 
-    response = requests.post(url, headers=headers, data=data)
+    async with http_client.stream("POST", url, headers=headers, data=data) as response:
+        async for row in iter_csv_rows(response.aiter_text()):
+            yield row
+
+
+async def ingest_sbir() -> dict:
+    """
+    Stream the topics CSV and send only new or changed rows to the sbir table
+    in chunks. New rows are inserted ignoring duplicates so existing summaries
+    are never overwritten; changed rows are updated with the CSV columns only,
+    which leaves their summary in place.
+    """
+    since, full = next_open_date_from()
+    stats = {"rows": 0, "new": 0, "changed": 0, "full": full}
+
+    async def flush(chunk: list[dict]) -> None:
+        known = index.hashes([r[KEY] for r in chunk])
+        new = [r for r in chunk if r[KEY] not in known]
+        changed = [
+            r for r in chunk if r[KEY] in known and known[r[KEY]] != row_hash(r)
+        ]
+        await repository.sbir.insert(new)
+        await repository.sbir.update(changed)
+        index.save(new + changed)
+        stats["new"] += len(new)
+        stats["changed"] += len(changed)
+
+    chunk = []
+    async for row in load_sbir_from_website(since):
+        if not row.get(KEY):
+            continue
+        chunk.append(row)
+        stats["rows"] += 1
+        if len(chunk) >= settings.SBIR_UPSERT_CHUNK:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+
+    if full and stats["rows"] == 0:
+        raise Exception("No SBIR Grants found on the website")
 
-    # Write the response to file
-    with open("tmp/sbir.csv", "w") as f:
-        f.write(response.text)
+    today = date.today().isoformat()
+    index.set_meta("watermark", today)
+    if full:
+        index.set_meta("last_full", today)
+    return stats
+
+
+def topic_prompt(info: dict) -> str:
+    return f"Topic Title: {info['Topic Title']}\nTopic Description: {info['Topic Description']}"
+
+
+async def summarizer(info: dict) -> dict | None:
+    prompt = f"Please concisely summarize the SBIR grant info:\n\n{topic_prompt(info)}."
+    try:
+        summary = await llm.complete(
+            response_model=Summary,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        info["summary"] = summary.summary
+        return info
+    except Exception as e:
+        logger.error(f"[TRACKING>SBIR>SUMMARIZER] Could not summarize: {info}; {e}")
+        return None
+
+
+def pack_batches(rows: list[dict]) -> list[list[dict]]:
+    """
+    Greedily pack topics into batches that stay under the prompt token budget
+    and the per-batch topic cap. A topic over budget on its own gets a batch
+    of one.
+    """
+    batches, batch, batch_tokens = [], [], 0
+    for info in rows:
+        tokens = llm.estimate_tokens(topic_prompt(info))
+        if batch and (
+            batch_tokens + tokens > settings.SBIR_BATCH_TOKEN_BUDGET
+            or len(batch) >= settings.SBIR_BATCH_SIZE
+        ):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(info)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+async def summarize_batch(batch: list[dict]) -> list[dict | None]:
+    """
+    Summarize several topics in one request, keyed by topic link. Topics the
+    response misses (or the whole batch, if the request fails) fall back to
+    single-topic calls.
+    """
+    if len(batch) == 1:
+        return [await summarizer(batch[0])]
+
+    topics = "\n\n".join(
+        f"Topic Link: {info[KEY]}\n{topic_prompt(info)}" for info in batch
+    )
+    prompt = f"Please concisely summarize each of the following SBIR grant topics. Return one summary per topic with its Topic Link copied exactly.\n\n{topics}"
+    try:
+        response = await llm.complete(
+            response_model=TopicSummaries,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=settings.SBIR_BATCH_COMPLETION_TOKENS_PER_TOPIC * len(batch),
+        )
+        by_link = {s.link.strip(): s.summary for s in response.summaries}
+    except Exception as e:
+        logger.error(f"[TRACKING>SBIR>SUMMARIZER] Batch of {len(batch)} failed: {e}")
+        by_link = {}
+
+    results, missed = [], []
+    for info in batch:
+        if summary := by_link.get(info[KEY]):
+            info["summary"] = summary
+            results.append(info)
+        else:
+            missed.append(info)
+    if missed:
+        logger.info(
+            f"[TRACKING>SBIR>SUMMARIZER] {len(missed)}/{len(batch)} topics missing from batch, summarizing singly"
+        )
+        results += await asyncio.gather(*[summarizer(info) for info in missed])
+    return results
+
+
+async def summarize_stage(batch: list[dict]) -> list[list[dict]]:
+    summaries = [s for s in await summarize_batch(batch) if s]
+    return [summaries] if summaries else []
+
+
+async def persist_stage(summaries: list[dict]) -> list[Post]:
+    """
+    Write the summaries, then record their posts in the outbox so a crash
+    between the write and the Discord send is replayed on startup.
+    """
+    await repository.sbir.set_summaries(summaries)
+    return outbox.add(
+        [
+            (
+                CHANNEL_ID,
+                "embed",
+                {
+                    "embed_title": s["Topic Title"],
+                    "embed_description": s["summary"],
+                    "embed_url": s[KEY],
+                },
+            )
+            for s in summaries
+        ]
+    )
+
+
+async def notify_stage(post: Post) -> None:
+    outbox.send(post)
+
+
+def describe(item) -> str:
+    # topic batches and summaries are lists, posts are outbox tuples
+    if isinstance(item, list):
+        return f"{len(item)} topics"
+    return f"post {item[0]}"
 
 
 async def track_sbir() -> list[dict]:
     """
     STEPS:
-    1. Scrape the SBIR website by running the curl command
-    2. Upload to the database > sbir, primary key is url; ignore all duplicates; if not exists, add to db
-    3. Get all rows where summary is null, summarize, add to db, send to discord > tracking >
+    1. Stream the SBIR topics CSV from the website
+    2. Upload new/changed rows to the database > sbir, primary key is url; new rows ignore duplicates, changed rows keep their summary
+    3. Get all rows where summary is null, summarize, write just the summaries, send to discord > tracking >
     4. if any error send to discord > errors
     """
 
-    async def summarizer(info: dict, sem: asyncio.Semaphore) -> dict | None:
-        async with sem:
-            prompt = f"Please concisely summarize the SBIR grant info:\n\nTopic Title: {info['Topic Title']}\nTopic Description: {info['Topic Description']}."
-            try:
-                summary = await settings.async_openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    response_model=Summary,
-                    messages=[{"role": "user", "content": prompt}],
-                )
-                info["summary"] = summary.summary
-                return info
-            except Exception as e:
-                logger.error(
-                    f"[TRACKING>SBIR>SUMMARIZER] Could not summarize: {info}; {e}"
-                )
-                return None
-
     try:
         logger.info(f"[TRACKING>SBIR] Fetching SBIR Grants from {url}")
 
-        load_sbir_from_website()
-        df = pd.read_csv("tmp/sbir.csv")
-        # if 0 lines raise error
-        if len(df) == 0:
-            raise Exception("No SBIR Grants found on the website")
-
-        rows = df.to_dict(orient="records")
-        # ignore duplicates coz we dont wanna overwrite existing rows which have summaries
-        settings.supabase_client.table("sbir").upsert(
-            rows, ignore_duplicates=True
-        ).execute()
-
-        sem = asyncio.Semaphore(72)
-        # this wont ever go above a 1000 so we aint too worried about supabase only returning 1000 rows
-        rows = (
-            settings.supabase_client.table("sbir")
-            .select("*")
-            .is_("summary", "null")
-            .execute()
+        stats = await ingest_sbir()
+        logger.info(f"[TRACKING>SBIR] Ingested {stats}")
+
+        rows = await repository.sbir.unsummarized(
+            [KEY, "Topic Title", "Topic Description"]
         )
-        if len(rows.data) == 0:
+        if len(rows) == 0:
             logger.info("[TRACKING>SBIR] No SBIR Grants to summarize")
             return
 
-        tasks = [summarizer(info, sem) for info in rows.data]
-        summaries = await tqdm.gather(
-            *tasks, desc="Summarizing SBIR Grants", total=len(rows.data)
+        pipeline = Pipeline(
+            "sbir",
+            [
+                # as many workers as the llm window can grow to; the shared
+                # limiter decides how many of them actually call at once
+                Stage(
+                    "summarize",
+                    summarize_stage,
+                    workers=settings.LLM_MAX_CONCURRENCY,
+                ),
+                Stage(
+                    "persist",
+                    persist_stage,
+                    workers=settings.PIPELINE_PERSIST_WORKERS,
+                ),
+                Stage("notify", notify_stage),
+            ],
+            describe=describe,
+        )
+        batches = (
+            pack_batches(rows)
+            if settings.SBIR_BATCH_SUMMARIES
+            else [[row] for row in rows]
+        )
+        logger.info(
+            f"[TRACKING>SBIR>SUMMARIZER] Summarizing {len(rows)} topics in {len(batches)} requests"
+        )
+        metrics.current_source.set("sbir")
+        await pipeline.run(batches)
+        logger.info(f"[TRACKING>SBIR] Pipeline: {pipeline.stats()}")
+        logger.info(
+            f"[TRACKING>SBIR] SBIR Grants fetched and summarized; llm: {llm.limiter.stats()}; llm cache: {llm.cache.stats()}; clients: {settings.clients.stats()}"
         )
-        summaries = [s for s in summaries if s]
-        # dont ignore duplicates coz we are updating the rows with summaries
-        settings.supabase_client.table("sbir").upsert(summaries).execute()
-        for summary in summaries:
-            await send_embed(
-                CHANNEL_ID,
-                summary["Topic Title"],
-                summary["summary"],
-                summary["SBIRTopicLink"],
-            )
-        logger.info("[TRACKING>SBIR] SBIR Grants fetched and summarized")
     except Exception as e:
         logger.error(f"[TRACKING>SBIR>SUMMARIZER] {e}")
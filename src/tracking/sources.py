@@ -0,0 +1,270 @@
+import time
+
+from pydantic import BaseModel
+
+from src import local_store
+
+channels = {
+    "defense": 1314477322178531338,
+    "business": 1314490175375806505,
+    "world": 1314491244428398622,
+    "blogs": 1314496562008690761,
+}
+
+
+class Source(BaseModel):
+    title: str
+    url: str
+    # which tracker runs it ("news" or "blogs") and where it posts
+    tracker: str
+    category: str
+    channel_id: int
+    # fetch strategy
+    jina: bool = False
+    proxy: bool = False
+    captcha: bool = False
+    load_extension: bool = False
+    # tried in order after the primary strategy fails or its breaker is open,
+    # any of "jina", "browserbase", "browserbase_proxy"
+    fallbacks: list[str] = []
+    # extraction hints, see src.tracking.extract and src.prune
+    pattern: str | None = None
+    selectors: list[str] | None = None
+    max_tokens: int | None = None
+    # poll interval bounds in hours, starting at initial_interval
+    initial_interval: float
+    min_interval: float
+    max_interval: float
+
+    @property
+    def strategies(self) -> list[str]:
+        if self.jina:
+            primary = "jina"
+        else:
+            primary = "browserbase_proxy" if self.proxy else "browserbase"
+        return [primary] + [f for f in self.fallbacks if f != primary]
+
+
+def news(category: str, **kwargs) -> Source:
+    return Source(
+        tracker="news",
+        category=category,
+        channel_id=channels[category],
+        initial_interval=12,
+        min_interval=1,
+        max_interval=24,
+        **kwargs,
+    )
+
+
+def blog(category: str, **kwargs) -> Source:
+    # blogs all post to the blogs channel whatever their category
+    return Source(
+        tracker="blogs",
+        category=category,
+        channel_id=channels["blogs"],
+        initial_interval=24,
+        min_interval=6,
+        max_interval=24 * 7,
+        **kwargs,
+    )
+
+
+sources = [
+    news(
+        "defense",
+        title="Defense News",
+        url="https://www.defensenews.com/",
+        jina=True,
+        fallbacks=["browserbase", "browserbase_proxy"],
+        pattern=r"/\d{4}/\d{2}/\d{2}/",
+    ),
+    news(
+        "business",
+        title="TechCrunch",
+        url="https://techcrunch.com",
+        jina=True,
+        fallbacks=["browserbase", "browserbase_proxy"],
+        pattern=r"/\d{4}/\d{2}/\d{2}/",
+    ),
+    news(
+        "defense",
+        title="Reuters",
+        url="https://www.reuters.com/business/aerospace-defense/",
+        proxy=True,
+        pattern=r"-\d{4}-\d{2}-\d{2}/?$",
+    ),
+    news(
+        "business",
+        title="Financial Times",
+        url="https://www.ft.com/companies",
+        proxy=True,
+        pattern=r"/content/[0-9a-f-]{36}$",
+        selectors=["#site-content", "main"],
+    ),
+    news(
+        "world",
+        title="Financial Times",
+        url="https://www.ft.com/world",
+        proxy=True,
+        pattern=r"/content/[0-9a-f-]{36}$",
+        selectors=["#site-content", "main"],
+    ),
+    news(
+        "defense",
+        title="Eric Berger",
+        url="https://arstechnica.com/author/ericberger/",
+        jina=True,
+        fallbacks=["browserbase", "browserbase_proxy"],
+        pattern=r"/\d{4}/\d{2}/[^/]+/?$",
+    ),
+    # WSJ blocks browserbase
+    # news(
+    #     "business",
+    #     title="WSJ",
+    #     url="https://www.wsj.com/business",
+    #     proxy=True,
+    #     captcha=True,
+    # ),
+    blog(
+        "world",
+        title="Stratechery",
+        url="https://stratechery.com/category/articles/",
+        jina=True,
+        pattern=r"stratechery\.com/\d{4}/[^/]+/?$",
+    ),
+    blog(
+        "blogs",
+        title="Snippet Finance",
+        url="https://snippet.finance/",
+        jina=True,
+    ),
+    blog(
+        "blogs",
+        title="Subsea Cables & Internet Infrastructure",
+        url="https://subseacables.blogspot.com/",
+        jina=True,
+        pattern=r"/\d{4}/\d{2}/[^/]+\.html$",
+    ),
+    blog(
+        "blogs",
+        title="Outside Five Sigma",
+        url="https://jwt625.github.io/",
+        jina=True,
+    ),
+]
+
+
+class SourceRegistry:
+    """
+    The configured sources plus each one's adaptive poll interval, derived
+    from the rate of new articles over its last HISTORY polls: long enough to
+    expect about TARGET_YIELD new articles per poll, always within the
+    source's min/max bounds. State is kept in sqlite.
+    """
+
+    TARGET_YIELD = 3
+    HISTORY = 20
+
+    def __init__(self, sources: list[Source]):
+        self.sources = {s.url: s for s in sources}
+        self.conn = local_store.connect("sources")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS polls (
+                url TEXT PRIMARY KEY,
+                interval REAL,
+                last_polled REAL
+            );
+            CREATE TABLE IF NOT EXISTS yields (
+                url TEXT,
+                polled_at REAL,
+                new INTEGER
+            );
+            """
+        )
+        self.conn.commit()
+
+    def _state(self, source: Source) -> tuple[float, float | None]:
+        row = self.conn.execute(
+            "SELECT interval, last_polled FROM polls WHERE url = ?", (source.url,)
+        ).fetchone()
+        if row is None:
+            return source.initial_interval, None
+        # bounds may have changed in code since the interval was stored
+        interval = min(source.max_interval, max(source.min_interval, row[0]))
+        return interval, row[1]
+
+    def is_due(self, source: Source, now: float | None = None) -> bool:
+        interval, last_polled = self._state(source)
+        now = now or time.time()
+        return last_polled is None or now >= last_polled + interval * 3600
+
+    def due(self, tracker: str, force: bool = False) -> list[Source]:
+        return [
+            s
+            for s in self.sources.values()
+            if s.tracker == tracker and (force or self.is_due(s))
+        ]
+
+    def record(self, source: Source, new: int) -> float:
+        """
+        Store a successful poll's yield and return the next interval in hours.
+        """
+        interval, _ = self._state(source)
+        now = time.time()
+        self.conn.execute("INSERT INTO yields VALUES (?, ?, ?)", (source.url, now, new))
+        self.conn.execute(
+            """
+            DELETE FROM yields WHERE url = ? AND polled_at NOT IN (
+                SELECT polled_at FROM yields WHERE url = ?
+                ORDER BY polled_at DESC LIMIT ?
+            )
+            """,
+            (source.url, source.url, self.HISTORY),
+        )
+        history = self.conn.execute(
+            "SELECT polled_at, new FROM yields WHERE url = ? ORDER BY polled_at",
+            (source.url,),
+        ).fetchall()
+        hours = (now - history[0][0]) / 3600
+        if hours > 0:
+            # each poll's yield covers the time since the poll before it; with
+            # nothing found, assume at most one article over the whole span
+            found = sum(r[1] for r in history[1:])
+            interval = self.TARGET_YIELD * hours / max(found, 1)
+        # the first poll has no span yet and keeps the initial interval
+        interval = min(source.max_interval, max(source.min_interval, interval))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO polls VALUES (?, ?, ?)",
+            (source.url, interval, now),
+        )
+        self.conn.commit()
+        return interval
+
+    def status(self) -> list[dict]:
+        status = []
+        for source in self.sources.values():
+            interval, last_polled = self._state(source)
+            yields = [
+                r[0]
+                for r in self.conn.execute(
+                    "SELECT new FROM yields WHERE url = ? ORDER BY polled_at DESC",
+                    (source.url,),
+                )
+            ]
+            status.append(
+                {
+                    "title": source.title,
+                    "url": source.url,
+                    "tracker": source.tracker,
+                    "interval_hours": round(interval, 2),
+                    "last_polled": last_polled,
+                    "due": self.is_due(source),
+                    "recent_yields": yields,
+                }
+            )
+        return status
+
+
+registry = SourceRegistry(sources)
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import tempfile
+
+# settings are read at import time; these tests never reach the services
+for name in (
+    "PORT",
+    "RAILWAY_ENVIRONMENT_NAME",
+    "BROWSERBASE_API_KEY",
+    "BROWSERBASE_PROJECT_ID",
+    "SUPABASE_URL",
+    "SUPABASE_KEY",
+    "DISCORD_TOKEN",
+    "OPENAI_API_KEY",
+    "JINA_API_KEY",
+):
+    os.environ.setdefault(name, "0" if name == "PORT" else "test")
+os.environ.setdefault("LOCAL_STORE_DIR", tempfile.mkdtemp(prefix="linchpin-test-"))
+
+from src.tracking.sbir import iter_csv_rows  # noqa: E402
+
+HEADER = "\ufeffTopic Title,Topic Description,SBIRTopicLink\r\n"
+
+
+def parse(text: str, chunk: int = 7) -> list[dict]:
+    async def chunks():
+        for i in range(0, len(text), chunk):
+            yield text[i : i + chunk]
+
+    async def collect():
+        return [row async for row in iter_csv_rows(chunks())]
+
+    return asyncio.run(collect())
+
+
+def test_header_bom_is_stripped():
+    rows = parse(HEADER + "A title,Objective,https://x/1\r\n")
+    assert rows == [
+        {
+            "Topic Title": "A title",
+            "Topic Description": "Objective",
+            "SBIRTopicLink": "https://x/1",
+        }
+    ]
+
+
+def test_unquoted_line_separators_stay_in_the_field():
+    for char in ("\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029"):
+        rows = parse(HEADER + f"A title,Objective{char}do things well,https://x/1\n")
+        assert len(rows) == 1
+        assert rows[0]["Topic Description"] == f"Objective{char}do things well"
+        assert rows[0]["SBIRTopicLink"] == "https://x/1"
+
+
+def test_quoted_line_breaks_are_kept_as_sent():
+    description = "Objective:\r\ndo\x0cthings well\nand more"
+    rows = parse(HEADER + f'A title,"{description}",https://x/1\r\nB,,https://x/2')
+    assert [r["SBIRTopicLink"] for r in rows] == ["https://x/1", "https://x/2"]
+    assert rows[0]["Topic Description"] == description
+    assert rows[1]["Topic Description"] is None